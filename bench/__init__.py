@@ -0,0 +1 @@
+"""Offline benchmarks for the download paths of ``main_windows_strict``."""
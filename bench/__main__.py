@@ -0,0 +1,328 @@
+"""Run offline benchmark scenarios and print the results as JSON.
+
+Usage::
+
+    python -m bench --items 20 --latency-ms 20 --output bench.json
+"""
+from contextlib import redirect_stdout
+from pathlib import Path
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.stub_server import StubConfig, start_stub
+from bench import fake_ytdlp
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = (
+    'wb_single_cold', 'wb_single_warm', 'wb_batch', 'pinterest', 'direct_image',
+    'video', 'playlist', 'handle_url_mixed', 'download_all', 'add_link_from_clipboard',
+    'sorted_copy_files',
+)
+
+
+def peak_rss_kb() -> int | None:
+    """Return the peak resident set size of this process in KiB."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak
+    except ImportError:
+        pass
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t),
+            ]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize // 1024
+    except Exception:
+        pass
+    return None
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[int(round(q * (len(ordered) - 1)))]
+
+
+def folder_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob('*') if p.is_file())
+
+
+class Bench:
+    """Patched copy of the application pointed at a temporary workspace."""
+
+    def __init__(self, app, workspace: Path, items: int) -> None:
+        self.app = app
+        self.workspace = workspace
+        self.items = items
+        self.downloads = workspace / 'Downloads'
+        # Config, log and the other system/ files live in the workspace too,
+        # so the user's [retry], [storage] and [profiling] settings are unused
+        system_dir = workspace / 'system'
+        system_dir.mkdir(exist_ok=True)
+        real_system = app.SYSTEM_DIR
+        for name, value in list(vars(app).items()):
+            if name.isupper() and isinstance(value, str) and (
+                    value == real_system or value.startswith(real_system + os.sep)):
+                setattr(app, name, str(system_dir) + value[len(real_system):])
+        root_logger = logging.getLogger()
+        for handler in root_logger.handlers[:]:
+            root_logger.removeHandler(handler)
+            handler.close()
+        handler = logging.FileHandler(app.LOG_FILE, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        root_logger.addHandler(handler)
+        app.DOWNLOADS_FOLDER = str(self.downloads)
+        app.VIDEOS_FOLDER = str(self.downloads / 'Videos')
+        app.PLAYLIST_FOLDER = str(self.downloads / 'Videos' / 'Playlist Videos')
+        app.PICTURES_FOLDER = str(self.downloads / 'Pictures')
+        app.WB_FOLDER = str(self.downloads / 'Pictures' / 'Wildberries')
+        app.WB_BASKET_URL = 'http://basket-{host:02d}.wbbasket.ru'
+        app.http_cache = app.HttpCache(app.HTTP_CACHE_DIR, 1 << 30, 24 * 3600)
+        app.ensure_directories()
+        fake_ytdlp.install(app)
+
+    def wb_urls(self, offset: int = 0) -> list[str]:
+        return [
+            f'https://www.wildberries.ru/catalog/{100000000 + offset + i * 100001}/detail.aspx'
+            for i in range(self.items)
+        ]
+
+    def pin_urls(self, offset: int = 0) -> list[str]:
+        return [f'http://www.pinterest.com/pin/{9000 + offset + i}/' for i in range(self.items)]
+
+    def image_urls(self, prefix: str = '') -> list[str]:
+        return [f'http://media.example/image/{prefix}{i}.jpg' for i in range(self.items)]
+
+    def video_urls(self, prefix: str = '') -> list[str]:
+        return [
+            f'https://www.youtube.com/watch?v={prefix}vid{i}'
+            for i in range(max(1, self.items // 5))
+        ]
+
+    def playlist_urls(self) -> list[str]:
+        return [
+            f'https://www.youtube.com/playlist?list=pl{i}'
+            for i in range(max(1, self.items // 10))
+        ]
+
+    def run(self, name: str) -> dict:
+        app = self.app
+        latencies: list[float] = []
+
+        def timed(func):
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    latencies.append(time.perf_counter() - start)
+            return wrapper
+
+        before = folder_size(self.downloads)
+        start = time.perf_counter()
+        count = self.items
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+            if name in ('wb_single_cold', 'wb_single_warm'):
+                call = timed(app.download_wb_images)
+                for url in self.wb_urls():
+                    call(url, app.WB_FOLDER)
+            elif name == 'wb_batch':
+                ids = [app.wb_product_id(url) for url in self.wb_urls(offset=7)]
+                timed(app.download_wb_batch)(ids, app.WB_FOLDER)
+            elif name == 'pinterest':
+                call = timed(app.download_pinterest_image)
+                for url in self.pin_urls():
+                    call(url, app.PICTURES_FOLDER)
+            elif name == 'direct_image':
+                call = timed(app.download_direct_image)
+                for url in self.image_urls():
+                    call(url, app.PICTURES_FOLDER)
+            elif name == 'video':
+                urls = self.video_urls()
+                count = len(urls)
+                call = timed(app.download_video)
+                for url in urls:
+                    call(url, app.VIDEOS_FOLDER)
+            elif name == 'playlist':
+                urls = self.playlist_urls()
+                count = len(urls) * fake_ytdlp.FakeYoutubeDL.playlist_size
+                call = timed(app.download_playlist)
+                for url in urls:
+                    call(url, app.PLAYLIST_FOLDER)
+            elif name == 'handle_url_mixed':
+                urls = self.mixed_urls(1)
+                count = len(urls)
+                call = timed(app.handle_url)
+                for url in urls:
+                    call(url)
+            elif name == 'download_all':
+                urls = self.mixed_urls(2)
+                count = len(urls)
+                Path(app.DOWNLOAD_LIST).write_text('\n'.join(urls) + '\n', encoding='utf-8')
+                app.perf.reset()
+                original = app.handle_url
+                app.handle_url = timed(original)
+                try:
+                    app.download_all(None)
+                    while app.downloading.is_set():
+                        time.sleep(0.01)
+                finally:
+                    app.handle_url = original
+            elif name == 'add_link_from_clipboard':
+                count = self.items * 10
+                Path(app.DOWNLOAD_LIST).write_text('', encoding='utf-8')
+                pending = iter(f'http://media.example/image/clip{i}.jpg' for i in range(count))
+                original = app.attempt_copy_selected_text
+                app.attempt_copy_selected_text = lambda *a, **k: next(pending)
+                app.clipboard_helper = None
+                try:
+                    call = timed(app.add_link_from_clipboard)
+                    for _ in range(count):
+                        call()
+                finally:
+                    app.attempt_copy_selected_text = original
+            elif name == 'sorted_copy_files':
+                import sorted as sorted_script
+                count = self.items * 10
+                source = self.workspace / 'sorted-source'
+                source.mkdir(exist_ok=True)
+                paths = []
+                for i in range(count):
+                    path = source / f'{i}.bin'
+                    path.write_bytes(b'\0' * 256 * 1024)
+                    paths.append(str(path))
+                list_path = self.workspace / 'sorted-list.txt'
+                list_path.write_text('\n'.join(paths), encoding='utf-8')
+                target = self.downloads / 'Sorted'
+                timed(sorted_script.copy_files)(list_path, target)
+            else:
+                raise ValueError(f'Unknown scenario: {name}')
+        seconds = time.perf_counter() - start
+        written = folder_size(self.downloads) - before
+        stages = {}
+        if name == 'download_all' and os.path.exists(app.PERF_REPORT_FILE):
+            with open(app.PERF_REPORT_FILE, encoding='utf-8') as f:
+                stages = json.load(f).get('stages', {})
+        result = {
+            'items': count,
+            'seconds': round(seconds, 4),
+            'items_per_second': round(count / seconds, 2) if seconds else None,
+            'mb_per_second': round(written / seconds / 1024 / 1024, 2) if seconds else None,
+            'bytes_written': written,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 0.50) * 1000, 2),
+                'p90': round(percentile(latencies, 0.90) * 1000, 2),
+                'p99': round(percentile(latencies, 0.99) * 1000, 2),
+                'max': round(max(latencies, default=0.0) * 1000, 2),
+            },
+        }
+        if stages:
+            result['stages'] = stages
+        return result
+
+    def mixed_urls(self, seed: int) -> list[str]:
+        """Return a mix of every link type, distinct for each ``seed``."""
+        urls = []
+        prefix = f'm{seed}-'
+        groups = (
+            self.wb_urls(offset=seed * 10), self.pin_urls(offset=seed * 1000),
+            self.image_urls(prefix), self.video_urls(prefix),
+        )
+        for group in groups:
+            urls.extend(group[: max(1, self.items // 4)])
+        return urls
+
+
+def git_version() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT, text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except Exception:
+        return 'unknown'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Offline download benchmarks.')
+    parser.add_argument('--items', type=int, default=20, help='items per scenario')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='run only this scenario (repeatable)')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--basket-hosts', type=int, default=30)
+    parser.add_argument('--missing-ratio', type=float, default=0.0,
+                        help='share of WB products answering 404 on every host')
+    parser.add_argument('--photo-kb', type=int, default=80)
+    parser.add_argument('--image-kb', type=int, default=2048)
+    parser.add_argument('--video-mb', type=int, default=20)
+    parser.add_argument('--output', type=Path, help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        basket_hosts=args.basket_hosts,
+        missing_ratio=args.missing_ratio,
+        image_kb=args.image_kb,
+        video_mb=args.video_mb,
+        photo_kb=args.photo_kb,
+    )
+    server = start_stub(config)
+    os.environ['HTTP_PROXY'] = os.environ['http_proxy'] = server.url
+    os.environ.pop('NO_PROXY', None)
+    os.environ.pop('no_proxy', None)
+    fake_ytdlp.FakeYoutubeDL.video_size = args.video_mb * 1024 * 1024
+
+    if sys.platform != 'win32' and not os.environ.get('DISPLAY'):
+        os.environ.setdefault('PYSTRAY_BACKEND', 'dummy')
+    sys.path.insert(0, str(ROOT))
+    import main_windows_strict as app
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='ytd-bench-') as tmp:
+        bench = Bench(app, Path(tmp), args.items)
+        for name in args.scenario or SCENARIOS:
+            results[name] = bench.run(name)
+    server.shutdown()
+
+    report = {
+        'version': git_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'stub': vars(config),
+        # ru_maxrss only grows, so the peak is reported for the whole run
+        'peak_rss_kb': peak_rss_kb(),
+        'requests': server.requests,
+        'scenarios': results,
+    }
+    data = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(data + '\n', encoding='utf-8')
+    else:
+        print(data)
+
+
+if __name__ == '__main__':
+    main()
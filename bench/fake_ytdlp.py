@@ -0,0 +1,116 @@
+"""Minimal stand-in for ``yt_dlp`` that downloads from the stub server."""
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+import os
+
+import requests
+
+MEDIA_URL = 'http://media.example/video/{id}?size={size}'
+
+
+class FakeYoutubeDL:
+    """Subset of ``yt_dlp.YoutubeDL`` used by the downloader.
+
+    Video links return a single entry, ``list=`` links a playlist of
+    ``playlist_size`` entries (bare links with ``extract_flat``, full entries
+    otherwise). Media bytes are streamed from the stub server and written
+    using the ``outtmpl`` option like the real class.
+    """
+
+    video_size = 20 * 1024 * 1024
+    playlist_size = 3
+
+    def __init__(self, params: dict | None = None) -> None:
+        self.params = params or {}
+
+    def __enter__(self) -> 'FakeYoutubeDL':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def _video_info(self, video_id: str, url: str) -> dict:
+        return {
+            'id': video_id,
+            'title': f'Video {video_id}',
+            'ext': 'mp4',
+            'url': MEDIA_URL.format(id=video_id, size=self.video_size),
+            'webpage_url': url,
+            'filesize': self.video_size,
+        }
+
+    def extract_info(self, url: str, download: bool = True) -> dict:
+        query = parse_qs(urlparse(url).query)
+        if 'list' in query and 'v' not in query:
+            list_id = query['list'][0]
+            entries = []
+            for i in range(1, self.playlist_size + 1):
+                video_id = f'{list_id}-{i}'
+                video_url = f'https://www.youtube.com/watch?v={video_id}'
+                if self.params.get('extract_flat'):
+                    entries.append({'_type': 'url', 'id': video_id, 'url': video_url})
+                else:
+                    entries.append(self._video_info(video_id, video_url))
+            info = {
+                '_type': 'playlist',
+                'id': list_id,
+                'title': f'Playlist {list_id}',
+                'entries': entries,
+            }
+        else:
+            video_id = query.get('v', [os.path.basename(urlparse(url).path)])[0]
+            info = self._video_info(video_id, url)
+        if download:
+            self.process_ie_result(info, download=True)
+        return info
+
+    def prepare_filename(self, info: dict) -> str:
+        outtmpl = self.params.get('outtmpl', '%(title)s.%(ext)s')
+        if isinstance(outtmpl, dict):
+            outtmpl = outtmpl.get('default', '%(title)s.%(ext)s')
+        return outtmpl % info
+
+    def process_ie_result(self, info: dict, download: bool = True) -> dict:
+        if info.get('_type') == 'url':
+            return self.extract_info(info['url'], download)
+        if info.get('_type') == 'playlist':
+            for entry in info['entries']:
+                self.process_ie_result(entry, download)
+        elif download:
+            self._download(info)
+        return info
+
+    def download(self, urls: list[str]) -> int:
+        for url in urls:
+            self.extract_info(url, download=True)
+        return 0
+
+    def _download(self, info: dict) -> None:
+        filename = self.prepare_filename(info)
+        hooks = self.params.get('progress_hooks', [])
+        total = info.get('filesize')
+        done = 0
+        with requests.get(info['url'], stream=True, timeout=30) as resp:
+            resp.raise_for_status()
+            with open(filename, 'wb') as f:
+                for chunk in resp.iter_content(256 * 1024):
+                    f.write(chunk)
+                    done += len(chunk)
+                    for hook in hooks:
+                        hook({'status': 'downloading', 'filename': filename,
+                              'downloaded_bytes': done, 'total_bytes': total})
+        for hook in hooks:
+            hook({'status': 'finished', 'filename': filename,
+                  'downloaded_bytes': done, 'total_bytes': total})
+
+
+class DownloadError(Exception):
+    pass
+
+
+def install(module) -> None:
+    """Replace ``module.yt_dlp`` with the fake implementation."""
+    module.yt_dlp = SimpleNamespace(
+        YoutubeDL=FakeYoutubeDL,
+        utils=SimpleNamespace(DownloadError=DownloadError),
+    )
@@ -0,0 +1,169 @@
+"""Local HTTP stub imitating Wildberries, Pinterest and media hosts.
+
+The server is meant to be used as an HTTP proxy: requests for
+``http://basket-NN.wbbasket.ru/...``, ``http://www.pinterest.com/...``,
+``http://i.pinimg.com/...`` and ``http://media.example/...`` arrive with an
+absolute URL in the request line and are answered locally, so no traffic
+leaves the machine.
+"""
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import hashlib
+import json
+import re
+import threading
+import time
+
+BASKET_HOST_RE = re.compile(r'basket-(\d+)\.wbbasket\.ru$')
+CARD_RE = re.compile(r'/vol(\d+)/part\d+/(\d+)/info/ru/card\.json$')
+PHOTO_RE = re.compile(r'/vol(\d+)/part\d+/(\d+)/images/big/(\d+)\.webp$')
+PIN_RE = re.compile(r'/pin/(\d+)/?$')
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class StubConfig:
+    """Behaviour of the stub server."""
+
+    latency_ms: float = 0.0
+    basket_hosts: int = 30
+    missing_ratio: float = 0.0
+    photo_count: int = 5
+    photo_kb: int = 80
+    image_kb: int = 2048
+    video_mb: int = 20
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'StubServer'
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        config = self.server.config
+        if config.latency_ms:
+            time.sleep(config.latency_ms / 1000)
+        parsed = urlparse(self.path)
+        host = (parsed.hostname or self.headers.get('Host', '')).split(':')[0].lower()
+        path = parsed.path
+        self.server.count(host)
+
+        m = BASKET_HOST_RE.match(host)
+        if m:
+            return self._basket(int(m.group(1)), path)
+        if 'pinterest' in host:
+            m = PIN_RE.search(path)
+            if m:
+                return self._pin_page(m.group(1))
+        if host == 'i.pinimg.com' and path.startswith('/originals/'):
+            return self._payload(config.image_kb * 1024, 'image/jpeg')
+        if host == 'media.example':
+            size = int(parse_qs(parsed.query).get('size', [0])[0])
+            if path.startswith('/video/'):
+                return self._payload(size or config.video_mb * 1024 * 1024, 'video/mp4')
+            if path.startswith('/image/'):
+                return self._payload(size or config.image_kb * 1024, 'image/jpeg')
+        self._send(404, b'', 'text/plain')
+
+    def _send(self, status: int, body: bytes, content_type: str, etag: str = '') -> None:
+        if etag and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _payload(self, size: int, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        chunk = b'\0' * CHUNK_SIZE
+        remaining = size
+        while remaining > 0:
+            part = chunk[:min(CHUNK_SIZE, remaining)]
+            self.wfile.write(part)
+            remaining -= len(part)
+
+    def _basket(self, host: int, path: str) -> None:
+        config = self.server.config
+        m = CARD_RE.search(path) or PHOTO_RE.search(path)
+        if not m:
+            return self._send(404, b'', 'text/plain')
+        vol, product_id = int(m.group(1)), m.group(2)
+        missing = int(product_id) % 100 < config.missing_ratio * 100
+        if missing or host != vol % config.basket_hosts:
+            return self._send(404, b'', 'text/plain')
+        if path.endswith('card.json'):
+            card = {
+                'imt_name': f'Товар {product_id}',
+                'selling': {'brand_name': 'Stub'},
+                'media': {'photo_count': config.photo_count},
+                'grouped_options': [{
+                    'group_name': 'Основная информация',
+                    'options': [{'name': 'Артикул', 'value': product_id}],
+                }],
+                'description': 'Описание товара ' * 20,
+            }
+            body = json.dumps(card, ensure_ascii=False).encode('utf-8')
+            return self._send(200, body, 'application/json', _etag(path))
+        self._payload(config.photo_kb * 1024, 'image/webp')
+
+    def _pin_page(self, pin_id: str) -> None:
+        orig = f'http://i.pinimg.com/originals/{pin_id[-2:]}/{pin_id}.jpg'
+        data = {'props': {'initialReduxState': {'pins': {pin_id: {
+            'id': pin_id,
+            'images': {
+                '236x': {'url': f'http://i.pinimg.com/236x/{pin_id}.jpg', 'width': 236},
+                'orig': {'url': orig, 'width': 1200},
+            },
+        }}}}}
+        filler = '<div class="x">' + 'lorem ipsum ' * 50 + '</div>'
+        html = (
+            '<!DOCTYPE html><html><head>'
+            f'<meta property="og:image" content="http://i.pinimg.com/736x/{pin_id}.jpg">'
+            f'<script id="__PWS_DATA__" type="application/json">{json.dumps(data)}</script>'
+            '</head><body><img src="http://s.pinimg.com/avatar.png">'
+            + filler * 400 + '</body></html>'
+        )
+        self._send(200, html.encode('utf-8'), 'text/html; charset=utf-8', _etag(pin_id))
+
+
+def _etag(key: str) -> str:
+    return '"' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] + '"'
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: StubConfig) -> None:
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.config = config
+        self.requests: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def count(self, host: str) -> None:
+        with self._lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start_stub(config: StubConfig) -> StubServer:
+    """Start a stub server in a background thread."""
+    server = StubServer(config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -6,10 +6,12 @@ PACKAGES = {
     'yt_dlp': 'yt-dlp',
     'requests': 'requests',
     'bs4': 'beautifulsoup4',
+    'lxml': 'lxml',
     'keyboard': 'keyboard',
     'pystray': 'pystray',
     'pyperclip': 'pyperclip',
     'PIL': 'pillow',
+    'numpy': 'numpy',
     'PyInstaller': 'pyinstaller',
     'pywin32': 'pywin32',
 }
@@ -0,0 +1,273 @@
+from pathlib import Path
+import argparse
+import os
+
+import numpy as np
+from PIL import Image
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp"}
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+DEFAULT_THRESHOLD = 6
+BATCH_SIZE = 256
+
+
+def hamming(a: int, b: int) -> int:
+    """Return the number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
+
+
+def load_thumbnail(path: Path) -> np.ndarray | None:
+    """Decode ``path`` into a small grayscale array for hashing.
+
+    ``Image.draft`` lets the JPEG decoder downscale while decoding, so large
+    photos never have to be decoded at full resolution.
+    """
+    try:
+        with Image.open(path) as img:
+            img.draft("L", (HASH_SIZE * 4, HASH_SIZE * 4))
+            gray = img.convert("L").resize(
+                (HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS
+            )
+            return np.asarray(gray, dtype=np.int16)
+    except Exception as e:
+        print(f"Не удалось прочитать {path}: {e}")
+        return None
+
+
+def dhash_batch(thumbs: list[np.ndarray]) -> list[int]:
+    """Compute 64-bit difference hashes for a batch of thumbnails at once."""
+    if not thumbs:
+        return []
+    stack = np.stack(thumbs)
+    bits = stack[:, :, 1:] > stack[:, :, :-1]
+    packed = np.packbits(bits.reshape(len(thumbs), -1), axis=1)
+    return [int.from_bytes(row.tobytes(), "big") for row in packed]
+
+
+def dhash(path: Path) -> int | None:
+    """Return the difference hash of a single image or ``None``."""
+    thumb = load_thumbnail(path)
+    if thumb is None:
+        return None
+    return dhash_batch([thumb])[0]
+
+
+class MultiIndex:
+    """Multi-index hashing table for Hamming radius queries.
+
+    Hashes are split into ``radius + 1`` disjoint bit chunks and every chunk
+    gets its own bucket table. Two hashes within ``radius`` bits must agree on
+    at least one whole chunk, so a query only compares against the hashes that
+    share a bucket with it instead of the whole library.
+    """
+
+    def __init__(self, radius: int) -> None:
+        self.radius = radius
+        count = min(radius + 1, HASH_BITS)
+        width, extra = divmod(HASH_BITS, count)
+        self._chunks: list[tuple[int, int]] = []
+        shift = 0
+        for i in range(count):
+            bits = width + (1 if i < extra else 0)
+            self._chunks.append((shift, (1 << bits) - 1))
+            shift += bits
+        self._tables: list[dict[int, list[int]]] = [{} for _ in self._chunks]
+
+    def add(self, value: int) -> None:
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table.setdefault((value >> shift) & mask, []).append(value)
+
+    def query(self, value: int, radius: int | None = None) -> list[tuple[int, int]]:
+        """Return ``(distance, hash)`` pairs within ``radius`` of ``value``."""
+        radius = self.radius if radius is None else min(radius, self.radius)
+        candidates: set[int] = set()
+        if self.radius >= HASH_BITS:
+            for bucket in self._tables[0].values():
+                candidates.update(bucket)
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            candidates.update(table.get((value >> shift) & mask, ()))
+        found = []
+        for candidate in candidates:
+            dist = hamming(value, candidate)
+            if dist <= radius:
+                found.append((dist, candidate))
+        found.sort()
+        return found
+
+
+class HashIndex:
+    """Persistent ``path -> hash`` index stored next to other runtime files.
+
+    Each line holds ``hash<TAB>mtime_ns<TAB>size<TAB>path``. Entries whose
+    modification time and size did not change are reused without decoding the
+    image again.
+    """
+
+    def __init__(self, index_path: Path) -> None:
+        self.index_path = index_path
+        self.entries: dict[str, tuple[int, int, int]] = {}
+        self._lookup: tuple[MultiIndex, dict[int, list[str]]] | None = None
+        self._load()
+
+    def _load(self) -> None:
+        if not self.index_path.exists():
+            return
+        with self.index_path.open(encoding="utf-8") as f:
+            for raw_line in f:
+                parts = raw_line.rstrip("\n").split("\t", 3)
+                if len(parts) != 4:
+                    continue
+                hash_hex, mtime, size, path = parts
+                try:
+                    self.entries[path] = (int(hash_hex, 16), int(mtime), int(size))
+                except ValueError:
+                    continue
+
+    def save(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            for path, (value, mtime, size) in self.entries.items():
+                f.write(f"{value:016x}\t{mtime}\t{size}\t{path}\n")
+        os.replace(tmp_path, self.index_path)
+
+    def update(self, root: Path) -> int:
+        """Hash new or changed images under ``root``; return how many."""
+        seen: set[str] = set()
+        pending: list[tuple[str, int, int]] = []
+        thumbs: list[np.ndarray] = []
+        hashed = 0
+
+        def flush() -> None:
+            for (key, mtime, size), value in zip(pending, dhash_batch(thumbs)):
+                self.entries[key] = (value, mtime, size)
+            pending.clear()
+            thumbs.clear()
+
+        for path in root.rglob("*"):
+            if path.suffix.lower() not in IMAGE_EXTENSIONS or not path.is_file():
+                continue
+            key = str(path.resolve())
+            seen.add(key)
+            stat = path.stat()
+            cached = self.entries.get(key)
+            if cached and cached[1] == stat.st_mtime_ns and cached[2] == stat.st_size:
+                continue
+            thumb = load_thumbnail(path)
+            if thumb is None:
+                continue
+            pending.append((key, stat.st_mtime_ns, stat.st_size))
+            thumbs.append(thumb)
+            hashed += 1
+            if len(thumbs) >= BATCH_SIZE:
+                flush()
+        flush()
+
+        root_key = str(root.resolve()) + os.sep
+        for key in list(self.entries):
+            if key.startswith(root_key) and key not in seen:
+                del self.entries[key]
+        self._lookup = None
+        return hashed
+
+    def lookup(self, threshold: int) -> tuple[MultiIndex, dict[int, list[str]]]:
+        """Return the bucket table of distinct hashes and the paths per hash.
+
+        The table is built once and reused for every query with the same or
+        a smaller ``threshold``.
+        """
+        if self._lookup is None or self._lookup[0].radius < threshold:
+            by_hash: dict[int, list[str]] = {}
+            for path, (value, _, _) in self.entries.items():
+                by_hash.setdefault(value, []).append(path)
+            table = MultiIndex(threshold)
+            for value in by_hash:
+                table.add(value)
+            self._lookup = (table, by_hash)
+        return self._lookup
+
+
+def find_similar(
+    index: HashIndex, image: Path, threshold: int = DEFAULT_THRESHOLD
+) -> list[tuple[int, str]]:
+    """Return ``(distance, path)`` pairs of images similar to ``image``."""
+    value = dhash(image)
+    if value is None:
+        return []
+    table, by_hash = index.lookup(threshold)
+    own = str(image.resolve())
+    result = []
+    for dist, match in table.query(value, threshold):
+        result.extend((dist, path) for path in by_hash[match] if path != own)
+    return result
+
+
+def duplicate_groups(index: HashIndex, threshold: int = DEFAULT_THRESHOLD) -> list[list[str]]:
+    """Group indexed images whose hashes are within ``threshold`` bits."""
+    table, by_hash = index.lookup(threshold)
+    parent = {value: value for value in by_hash}
+
+    def find(value: int) -> int:
+        while parent[value] != value:
+            parent[value] = parent[parent[value]]
+            value = parent[value]
+        return value
+
+    for value in by_hash:
+        for _, match in table.query(value, threshold):
+            a, b = find(value), find(match)
+            if a != b:
+                parent[b] = a
+
+    groups: dict[int, list[str]] = {}
+    for value, paths in by_hash.items():
+        groups.setdefault(find(value), []).extend(paths)
+    return [sorted(paths) for paths in groups.values() if len(paths) > 1]
+
+
+def write_report(groups: list[list[str]], report_path: Path) -> None:
+    """Write duplicate groups separated by blank lines to ``report_path``."""
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with report_path.open("w", encoding="utf-8") as f:
+        for group in sorted(groups, key=len, reverse=True):
+            f.write("\n".join(group))
+            f.write("\n\n")
+
+
+def main() -> None:
+    script_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(
+        description="Find near-duplicate images in the Pictures library."
+    )
+    parser.add_argument("image", nargs="?", type=Path,
+                        help="show images similar to this file")
+    parser.add_argument("--root", type=Path,
+                        default=script_dir / "Downloads" / "Pictures")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help="maximum differing bits (0-64)")
+    parser.add_argument("--rescan", action="store_true",
+                        help="rescan the library before a single-image query")
+    args = parser.parse_args()
+    if not 0 <= args.threshold <= HASH_BITS:
+        parser.error(f"--threshold must be between 0 and {HASH_BITS}")
+
+    index = HashIndex(script_dir / "system" / "image-hashes.tsv")
+    if args.image is None or args.rescan or not index.entries:
+        hashed = index.update(args.root)
+        index.save()
+        print(f"Проиндексировано новых изображений: {hashed}")
+
+    if args.image:
+        for dist, path in find_similar(index, args.image, args.threshold):
+            print(f"{dist:2d}  {path}")
+        return
+
+    groups = duplicate_groups(index, args.threshold)
+    report = script_dir / "system" / "duplicates.txt"
+    write_report(groups, report)
+    print(f"Найдено групп дубликатов: {len(groups)}. Отчёт: {report}")
+
+
+if __name__ == "__main__":
+    main()
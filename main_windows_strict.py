@@ -1,21 +1,44 @@
+from __future__ import annotations
+
 import os
 import sys
+import argparse
 import atexit
 import time
 import configparser
+import bisect
+import cProfile
+import csv
+import errno
+import glob
+import hashlib
+import io
+import json
 import logging
+import pstats
+import shutil
+import socket
+import sqlite3
+from collections import OrderedDict, deque
+from contextlib import closing, contextmanager
 from urllib.parse import urlparse
-from typing import Optional
+from typing import Callable, Optional
 import re
+from html import unescape
 
 import yt_dlp
 import requests
-from bs4 import BeautifulSoup
-import keyboard
-import pystray
-import pyperclip
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, SoupStrainer
 import threading
 import multiprocessing
+import itertools
+import queue
+import random
+import secrets
+import signal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from multiprocessing.connection import Connection
 try:
     import win32clipboard
@@ -27,9 +50,30 @@ except Exception:
     win32con = None  # type: ignore
     win32api = None  # type: ignore
     win32gui = None  # type: ignore
+# Трей и горячие клавиши не нужны в headless режиме и недоступны без дисплея
+try:
+    import keyboard
+except Exception:
+    keyboard = None  # type: ignore
+try:
+    import pystray
+except Exception:
+    pystray = None  # type: ignore
+try:
+    import pyperclip
+except Exception:
+    pyperclip = None  # type: ignore
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
 
 # Simple URL validation pattern used when grabbing the clipboard
 URL_RE = re.compile(r'https?://\S+', re.IGNORECASE)
+# Строка с артикулами WB: "12345678" или "wb:12345678,87654321"
+WB_IDS_RE = re.compile(r'(?:wb:\s*)?\d{5,}(?:\s*[,;\s]\s*\d{5,})*', re.IGNORECASE)
 
 from PIL import Image
 import subprocess
@@ -102,6 +146,9 @@ class HotkeyManager:
                         return
                 except Exception as e:
                     logging.error('Win32 hotkey failed: %s', e)
+        if not keyboard:
+            logging.error('Hotkeys are unavailable: %s', combo)
+            return
         handle = keyboard.add_hotkey(combo, callback, suppress=True)
         logging.info('Registered keyboard hotkey: %s', combo)
         self._handles.append(handle)
@@ -191,7 +238,7 @@ def read_clipboard() -> str:
                     win32clipboard.CloseClipboard()
                 except Exception:
                     pass
-    if not text:
+    if not text and pyperclip:
         try:
             text = pyperclip.paste()
         except Exception as e:
@@ -210,6 +257,8 @@ def send_ctrl_c() -> None:
             return
         except Exception as e:
             logging.error('keybd_event failed: %s', e)
+    if not keyboard:
+        return
     try:
         keyboard.press_and_release('ctrl+c')
     except Exception as e:
@@ -268,6 +317,16 @@ CONFIG_FILE = os.path.join(SYSTEM_DIR, 'config.ini')
 LOG_FILE = os.path.join(SYSTEM_DIR, 'script.log')
 INFO_FILE = os.path.join(SYSTEM_DIR, 'info.txt')
 LOCK_FILE = os.path.join(SYSTEM_DIR, 'script.lock')
+HTTP_CACHE_DIR = os.path.join(SYSTEM_DIR, 'http-cache')
+WB_HOSTS_FILE = os.path.join(SYSTEM_DIR, 'wb-hosts.json')
+QUEUE_DB = os.path.join(SYSTEM_DIR, 'queue.db')
+INGEST_STATE_FILE = os.path.join(SYSTEM_DIR, 'ingest-state.json')
+DEAD_LETTER_FILE = os.path.join(SYSTEM_DIR, 'dead-letter.txt')
+API_QUEUE_FILE = os.path.join(SYSTEM_DIR, 'api-queue.txt')
+PERF_REPORT_FILE = os.path.join(SYSTEM_DIR, 'perf-report.json')
+API_PERF_REPORT_FILE = os.path.join(SYSTEM_DIR, 'perf-report-api.json')
+WORKER_PERF_REPORT_FILE = os.path.join(SYSTEM_DIR, 'perf-report-worker.json')
+PROFILE_FILE = os.path.join(SYSTEM_DIR, 'profile.prof')
 EPHEMERAL_MODE = getattr(sys, 'frozen', False)
 
 DEFAULT_CONFIG = {
@@ -275,6 +334,55 @@ DEFAULT_CONFIG = {
     'download_hotkey': 'ctrl+shift+space',
 }
 
+CACHE_DEFAULTS = {
+    'max_mb': '200',
+    'ttl_days': '7',
+}
+
+DAEMON_DEFAULTS = {
+    'enabled': 'no',
+    'host': '127.0.0.1',
+    'port': '8765',
+    'token': '',
+    'workers': '2',
+}
+
+INGEST_DEFAULTS = {
+    'enabled': 'no',
+    'folders': 'Inbox',
+    'auto_download': 'yes',
+    'batch_size': '20',
+    'idle_seconds': '60',
+    'poll_seconds': '2',
+}
+
+RETRY_DEFAULTS = {
+    'max_attempts': '4',
+    'base_delay': '5',
+    'max_delay': '300',
+    'max_wait': '1800',
+    'breaker_failures': '3',
+    'breaker_cooldown': '120',
+}
+
+STORAGE_DEFAULTS = {
+    'video_folders': '',
+    'reserve_mb': '1024',
+}
+
+PROFILING_DEFAULTS = {
+    'report': 'yes',
+    'cprofile': 'no',
+}
+
+CLUSTER_DEFAULTS = {
+    'database': '',
+    'lease_seconds': '300',
+    'poll_seconds': '5',
+    'max_attempts': '3',
+    'worker_id': '',
+}
+
 
 def create_runtime_files() -> None:
     os.makedirs(SYSTEM_DIR, exist_ok=True)
@@ -295,8 +403,14 @@ def create_runtime_files() -> None:
 
 
 def cleanup_runtime_files() -> None:
+    # http-cache/ and wb-hosts.json are kept so that repeat runs of the
+    # packaged app still get conditional requests and known basket hosts;
+    # api-queue.txt keeps links of unfinished API jobs for the next start,
+    # ingest-state.json keeps drop folder offsets and links already taken and
+    # dead-letter.txt keeps links that failed for good.
     logging.shutdown()
-    for path in (DOWNLOAD_LIST, CONFIG_FILE, LOG_FILE, INFO_FILE, LOCK_FILE):
+    for path in (DOWNLOAD_LIST, CONFIG_FILE, LOG_FILE, INFO_FILE, LOCK_FILE, PERF_REPORT_FILE,
+                 API_PERF_REPORT_FILE, WORKER_PERF_REPORT_FILE, PROFILE_FILE):
         try:
             os.remove(path)
         except FileNotFoundError:
@@ -332,6 +446,230 @@ logging.basicConfig(
 # Флаг, указывающий выполняется ли сейчас скачивание
 downloading = threading.Event()
 
+# Блокировка проверки и установки флага downloading
+download_start_lock = threading.Lock()
+
+# Блокировка чтения и записи download-list.txt
+download_list_lock = threading.Lock()
+
+# Блокировка перезаписи таблицы товаров WB
+wb_export_lock = threading.Lock()
+
+# Задание API, которое выполняет текущий поток
+_current_job = threading.local()
+
+# Причина неудачи текущего потока, после которой повтор не поможет
+_permanent_failure = threading.local()
+
+
+class JobCancelled(Exception):
+    """Raised inside a download when its job was cancelled."""
+
+
+def report_progress(done: float, total: float) -> None:
+    """Update progress of the job handled by the current thread.
+
+    Raises ``JobCancelled`` when the job was cancelled through the API, which
+    stops the running download at the next progress report.
+    """
+    job = getattr(_current_job, 'job', None)
+    if job is None:
+        return
+    if job.cancel_requested.is_set():
+        raise JobCancelled(job.id)
+    if total:
+        job.progress = min(1.0, done / total)
+
+
+# Ответы, после которых повторять запрос бесполезно
+PERMANENT_HTTP_STATUSES = {404, 410}
+
+
+def report_permanent_failure(reason: str) -> None:
+    """Mark the download handled by the current thread as failed for good.
+
+    ``DownloadQueue`` writes such links to ``dead-letter.txt`` right away
+    instead of retrying them.
+    """
+    logging.warning('Повтор не поможет: %s', reason)
+    _permanent_failure.reason = reason
+
+
+def take_permanent_failure() -> Optional[str]:
+    """Return and clear the reason reported by the current thread."""
+    reason = getattr(_permanent_failure, 'reason', None)
+    _permanent_failure.reason = None
+    return reason
+
+
+# === Замеры производительности ===
+PERF_STAGES = ('clipboard', 'resolve', 'connect', 'transfer', 'write', 'post-process', 'total')
+# Границы корзин гистограммы в миллисекундах
+PERF_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+PERF_SLOWEST = 10
+PERF_MAX_SPANS = 100000
+
+
+class PerfRecorder:
+    """Collects timing spans of download stages for the run report.
+
+    Stages are ``resolve`` (host probing, page and metadata extraction),
+    ``connect`` (time until response headers), ``transfer``, ``write``,
+    ``post-process`` (yt-dlp postprocessors), ``clipboard`` and ``total`` per
+    link. Every run records into its own recorder (see ``perf_run``); spans
+    recorded outside a run, such as clipboard waits, go to the shared ``perf``
+    and are moved into the next ``download_all`` report by ``detach``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._spans: deque[tuple[str, str, float]] = deque(maxlen=PERF_MAX_SPANS)
+        self.started = time.time()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self.started = time.time()
+
+    def detach(self) -> 'PerfRecorder':
+        """Move the recorded spans into a new recorder and start over."""
+        recorder = PerfRecorder()
+        with self._lock:
+            recorder._spans.extend(self._spans)
+            recorder.started = self.started
+            self._spans.clear()
+            self.started = time.time()
+        return recorder
+
+    def record(self, stage: str, seconds: float, url: str = '') -> None:
+        with self._lock:
+            self._spans.append((stage, url, seconds))
+
+    @contextmanager
+    def span(self, stage: str, url: str = ''):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, url)
+
+    def report(self) -> dict:
+        with self._lock:
+            spans = list(self._spans)
+        stages: dict[str, list[float]] = {}
+        totals: dict[str, float] = {}
+        for stage, url, seconds in spans:
+            stages.setdefault(stage, []).append(seconds)
+            if stage == 'total' and url:
+                totals[url] = totals.get(url, 0.0) + seconds
+
+        def ms(value: float) -> float:
+            return round(value * 1000, 2)
+
+        result = {}
+        for stage, values in stages.items():
+            values.sort()
+            buckets = [0] * (len(PERF_BUCKETS_MS) + 1)
+            for value in values:
+                buckets[bisect.bisect_left(PERF_BUCKETS_MS, value * 1000)] += 1
+            labels = [f'<={edge}ms' for edge in PERF_BUCKETS_MS] + [f'>{PERF_BUCKETS_MS[-1]}ms']
+            result[stage] = {
+                'count': len(values),
+                'total_ms': ms(sum(values)),
+                'p50_ms': ms(values[int(0.50 * (len(values) - 1))]),
+                'p90_ms': ms(values[int(0.90 * (len(values) - 1))]),
+                'p99_ms': ms(values[int(0.99 * (len(values) - 1))]),
+                'max_ms': ms(values[-1]),
+                'histogram': {label: n for label, n in zip(labels, buckets) if n},
+            }
+        slowest = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+        return {
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+            'duration_ms': ms(time.time() - self.started),
+            'stages': {stage: result[stage] for stage in PERF_STAGES if stage in result},
+            'slowest_urls': [{'url': url, 'ms': ms(seconds)} for url, seconds in slowest[:PERF_SLOWEST]],
+        }
+
+    def write_report(self, path: str, profile_text: str = '') -> None:
+        data = self.report()
+        if profile_text:
+            data['profile'] = profile_text.splitlines()
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            logging.info('Отчёт о производительности: %s', path)
+        except Exception as e:
+            logging.error('Не удалось сохранить отчёт о производительности: %s', e)
+
+
+perf = PerfRecorder()
+
+# Замеры прогона, который выполняет текущий поток
+_perf_local = threading.local()
+
+
+def current_perf() -> PerfRecorder:
+    """Return the recorder of the run handled by the current thread."""
+    return getattr(_perf_local, 'recorder', None) or perf
+
+
+@contextmanager
+def perf_run(recorder: PerfRecorder):
+    """Record spans of the current thread into ``recorder``."""
+    previous = getattr(_perf_local, 'recorder', None)
+    _perf_local.recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _perf_local.recorder = previous
+
+
+def with_current_perf(func):
+    """Wrap ``func`` for a thread pool so it records into the caller's run."""
+    recorder = current_perf()
+
+    def run(*args, **kwargs):
+        with perf_run(recorder):
+            return func(*args, **kwargs)
+    return run
+
+
+def timed_get(session, url: str, **kwargs) -> requests.Response:
+    """``session.get`` that records ``connect`` and ``transfer`` spans."""
+    start = time.perf_counter()
+    resp = session.get(url, **kwargs)
+    total = time.perf_counter() - start
+    # elapsed — время до получения заголовков ответа (соединение, TLS, ожидание)
+    connect = min(total, resp.elapsed.total_seconds())
+    current_perf().record('connect', connect, url)
+    current_perf().record('transfer', total - connect, url)
+    return resp
+
+
+def profiling_enabled(settings: Optional[dict] = None) -> bool:
+    settings = settings or load_settings('profiling', PROFILING_DEFAULTS)
+    return settings['cprofile'].lower() in ('1', 'yes', 'true', 'on')
+
+
+def set_profiling(enabled: bool) -> None:
+    """Store the ``cprofile`` switch in ``config.ini``."""
+    save_setting('profiling', 'cprofile', 'yes' if enabled else 'no', PROFILING_DEFAULTS)
+
+
+def write_perf_report(recorder: PerfRecorder, path: str, profile_text: str = '',
+                      settings: Optional[dict] = None) -> None:
+    """Write the report of a finished run unless reports are switched off."""
+    settings = settings or load_settings('profiling', PROFILING_DEFAULTS)
+    if settings['report'].lower() in ('1', 'yes', 'true', 'on') or profile_text:
+        recorder.write_report(path, profile_text)
+
+
+def _profile_summary(profiler: cProfile.Profile) -> str:
+    profiler.dump_stats(PROFILE_FILE)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(30)
+    return out.getvalue()
+
 # Изображения для разных состояний значка
 
 def load_icon(name: str) -> Optional[Image.Image]:
@@ -382,8 +720,39 @@ def load_config() -> dict:
     return DEFAULT_CONFIG.copy()
 
 
+def load_settings(section: str, defaults: dict) -> dict:
+    """Return options of ``section`` in ``config.ini`` merged over ``defaults``."""
+    parser = configparser.ConfigParser()
+    try:
+        parser.read(CONFIG_FILE, encoding='utf-8')
+        if parser.has_section(section):
+            return {**defaults, **dict(parser.items(section))}
+    except Exception as e:
+        logging.error('Ошибка загрузки конфигурации: %s', e)
+    return defaults.copy()
+
+
+def save_setting(section: str, key: str, value: str, defaults: dict) -> None:
+    """Store one option of ``section`` in ``config.ini``, keeping the rest."""
+    parser = configparser.ConfigParser()
+    try:
+        parser.read(CONFIG_FILE, encoding='utf-8')
+        if not parser.has_section(section):
+            parser[section] = defaults
+        parser[section][key] = value
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+            parser.write(f)
+    except Exception as e:
+        logging.error('Ошибка сохранения конфигурации: %s', e)
+
+
 def save_config(cfg: dict) -> None:
     parser = configparser.ConfigParser()
+    try:
+        # Сохраняем остальные секции файла
+        parser.read(CONFIG_FILE, encoding='utf-8')
+    except Exception:
+        pass
     parser['hotkeys'] = {
         'add_hotkey': cfg.get('add_hotkey', DEFAULT_CONFIG['add_hotkey']),
         'download_hotkey': cfg.get('download_hotkey', DEFAULT_CONFIG['download_hotkey'])
@@ -395,6 +764,184 @@ def save_config(cfg: dict) -> None:
         logging.error('Ошибка сохранения конфигурации: %s', e)
 
 
+class HttpCache:
+    """Local cache of HTTP bodies revalidated with conditional requests.
+
+    Responses that carry ``ETag`` or ``Last-Modified`` are stored under
+    ``system/http-cache``. The next request for the same URL sends
+    ``If-None-Match``/``If-Modified-Since`` and a ``304`` answer is served from
+    disk. Entries are evicted least-recently-used first once the total size
+    exceeds ``max_bytes`` and when they were not validated for ``ttl`` seconds.
+    """
+
+    def __init__(self, folder: str, max_bytes: int, ttl: float) -> None:
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._index_path = os.path.join(folder, 'index.json')
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._size = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.folder, f'{key}.body')
+
+    def _load(self) -> None:
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.error('Не удалось прочитать кэш HTTP: %s', e)
+            return
+        for key, entry in sorted(entries.items(), key=lambda item: item[1].get('used', 0)):
+            self._entries[key] = entry
+            self._size += entry.get('size', 0)
+        with self._lock:
+            self._evict()
+
+    def save(self) -> None:
+        """Write the cache index to disk if it changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._entries)
+            self._dirty = False
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            tmp_path = self._index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self._index_path)
+        except Exception as e:
+            logging.error('Не удалось сохранить кэш HTTP: %s', e)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry.get('size', 0)
+        self._dirty = True
+        try:
+            os.remove(self._body_path(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        deadline = time.time() - self.ttl
+        for key in [k for k, e in self._entries.items() if e.get('stored', 0) < deadline]:
+            self._drop(key)
+        while self._size > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+
+    def _store(self, key: str, url: str, resp: requests.Response) -> None:
+        etag = resp.headers.get('ETag')
+        modified = resp.headers.get('Last-Modified')
+        if not etag and not modified:
+            return
+        body = resp.content
+        if len(body) > self.max_bytes:
+            return
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(self._body_path(key), 'wb') as f:
+                f.write(body)
+        except Exception as e:
+            logging.error('Не удалось записать кэш HTTP: %s', e)
+            return
+        now = time.time()
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._size -= old.get('size', 0)
+            self._entries[key] = {
+                'url': url, 'etag': etag, 'modified': modified,
+                'size': len(body), 'stored': now, 'used': now,
+            }
+            self._size += len(body)
+            self._dirty = True
+            self._evict()
+
+    def get(self, url: str, session=requests, **kwargs) -> requests.Response:
+        """``session.get`` that revalidates and serves cached bodies."""
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        headers = dict(kwargs.pop('headers', None) or {})
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.get('stored', 0) < time.time() - self.ttl:
+                self._drop(key)
+                entry = None
+            entry = dict(entry) if entry else None
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('modified'):
+                headers['If-Modified-Since'] = entry['modified']
+
+        resp = session.get(url, headers=headers, **kwargs)
+        if resp.status_code == 304 and entry:
+            try:
+                with open(self._body_path(key), 'rb') as f:
+                    body = f.read()
+            except OSError:
+                with self._lock:
+                    self._drop(key)
+                headers.pop('If-None-Match', None)
+                headers.pop('If-Modified-Since', None)
+                return session.get(url, headers=headers, **kwargs)
+            resp.status_code = 200
+            resp._content = body
+            with self._lock:
+                if key in self._entries:
+                    now = time.time()
+                    self._entries[key].update(stored=now, used=now)
+                    self._entries.move_to_end(key)
+                    self._dirty = True
+            return resp
+        if resp.status_code == 200:
+            self._store(key, url, resp)
+        return resp
+
+
+def _cache_settings() -> tuple[int, float]:
+    settings = load_settings('cache', CACHE_DEFAULTS)
+    try:
+        max_bytes = int(float(settings['max_mb']) * 1024 * 1024)
+        ttl = float(settings['ttl_days']) * 24 * 3600
+    except ValueError:
+        logging.error('Неверные настройки кэша, используются значения по умолчанию')
+        max_bytes = int(CACHE_DEFAULTS['max_mb']) * 1024 * 1024
+        ttl = float(CACHE_DEFAULTS['ttl_days']) * 24 * 3600
+    return max_bytes, ttl
+
+
+http_cache = HttpCache(HTTP_CACHE_DIR, *_cache_settings())
+atexit.register(http_cache.save)
+
+
+def load_wb_hosts() -> dict[int, int]:
+    """Return the saved ``vol -> basket`` map of Wildberries hosts."""
+    try:
+        with open(WB_HOSTS_FILE, 'r', encoding='utf-8') as f:
+            return {int(vol): int(host) for vol, host in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.error('Не удалось прочитать хосты WB: %s', e)
+        return {}
+
+
+def save_wb_hosts(hosts: dict[int, int]) -> None:
+    try:
+        with open(WB_HOSTS_FILE, 'w', encoding='utf-8') as f:
+            json.dump({str(vol): host for vol, host in sorted(hosts.items())}, f)
+    except Exception as e:
+        logging.error('Не удалось сохранить хосты WB: %s', e)
+
+
 def ensure_single_instance() -> None:
     """Предотвращает запуск нескольких экземпляров скрипта."""
     if sys.platform.startswith('win'):
@@ -417,6 +964,172 @@ def ensure_single_instance() -> None:
             logging.info('Lock file released.')
 
         atexit.register(release_lock)
+    else:
+        import fcntl
+        lock_file = open(LOCK_FILE, 'w')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            logging.info('Попытка запуска второго экземпляра.')
+            print('Скрипт уже запущен.')
+            sys.exit(0)
+
+        def release_lock() -> None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
+                os.remove(LOCK_FILE)
+            except Exception:
+                pass
+            logging.info('Lock file released.')
+
+        atexit.register(release_lock)
+
+
+def _ydl_progress_hook(d: dict) -> None:
+    if d.get('status') == 'downloading':
+        total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+        report_progress(d.get('downloaded_bytes') or 0, total)
+    elif d.get('status') == 'finished' and d.get('elapsed'):
+        current_perf().record('transfer', d['elapsed'], d.get('filename', ''))
+
+
+# Время запуска постпроцессоров yt-dlp в текущем потоке
+_postprocess_started = threading.local()
+
+
+def _ydl_postprocessor_hook(d: dict) -> None:
+    name = d.get('postprocessor', '')
+    if d.get('status') == 'started':
+        setattr(_postprocess_started, name, time.perf_counter())
+    elif d.get('status') == 'finished':
+        start = getattr(_postprocess_started, name, None)
+        if start is not None:
+            current_perf().record('post-process', time.perf_counter() - start, name)
+
+
+# === Свободное место для видео ===
+class SpaceLedger:
+    """Keeps track of disk space promised to running video downloads.
+
+    A download reserves its expected size on the volume it writes to, so
+    parallel downloads do not all count the same free space.
+    """
+
+    def __init__(self) -> None:
+        self._reserved: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, folders: list[str], size: int, keep_free: int) -> Optional[str]:
+        """Return the first folder whose volume fits ``size`` plus ``keep_free``."""
+        with self._lock:
+            for folder in folders:
+                try:
+                    os.makedirs(folder, exist_ok=True)
+                    free = shutil.disk_usage(folder).free
+                    device = os.stat(folder).st_dev
+                except OSError as e:
+                    logging.error('Папка недоступна %s: %s', folder, e)
+                    continue
+                reserved = self._reserved.get(device, 0)
+                if free - reserved - keep_free >= size:
+                    self._reserved[device] = reserved + size
+                    return folder
+        return None
+
+    def release(self, folder: str, size: int) -> None:
+        with self._lock:
+            try:
+                device = os.stat(folder).st_dev
+            except OSError:
+                return
+            self._reserved[device] = max(0, self._reserved.get(device, 0) - size)
+
+
+space_ledger = SpaceLedger()
+
+
+def video_folders(folder: str) -> list[str]:
+    """Return ``folder`` followed by the same subfolder on spare volumes."""
+    settings = load_settings('storage', STORAGE_DEFAULTS)
+    relative = os.path.relpath(folder, DOWNLOADS_FOLDER)
+    folders = [folder]
+    for volume in settings['video_folders'].split(';'):
+        volume = volume.strip()
+        if volume:
+            folders.append(os.path.normpath(os.path.join(volume, relative)))
+    return folders
+
+
+def _keep_free_bytes() -> int:
+    try:
+        return int(float(load_settings('storage', STORAGE_DEFAULTS)['reserve_mb']) * 1024 * 1024)
+    except ValueError:
+        return int(STORAGE_DEFAULTS['reserve_mb']) * 1024 * 1024
+
+
+def expected_size(info: dict) -> int:
+    """Return the expected file size from yt-dlp metadata or ``0``."""
+    formats = info.get('requested_formats') or [info]
+    return sum(int(f.get('filesize') or f.get('filesize_approx') or 0) for f in formats)
+
+
+def _is_disk_full(error: BaseException) -> bool:
+    while error is not None:
+        if isinstance(error, OSError) and (
+            error.errno == errno.ENOSPC or getattr(error, 'winerror', None) == 112
+        ):
+            return True
+        if 'No space left on device' in str(error):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _remove_partial(ydl_opts: dict, info: dict) -> None:
+    """Delete ``.part`` files left by an interrupted download."""
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        base = os.path.splitext(ydl.prepare_filename(info))[0]
+    for path in glob.glob(glob.escape(base) + '*.part'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def download_with_space_check(url: str, folder: str, ydl_opts: dict) -> bool:
+    """Скачивает видео в папку, где хватает места.
+
+    The expected size comes from ``filesize``/``filesize_approx`` of the
+    selected formats. The first of ``video_folders`` that keeps
+    ``reserve_mb`` free after the download is used. If the disk still runs out
+    the partial file is removed and the next volume is tried.
+    """
+    with current_perf().span('resolve', url), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    size = expected_size(info)
+    keep_free = _keep_free_bytes()
+    tried: list[str] = []
+    while True:
+        candidates = [f for f in video_folders(folder) if f not in tried]
+        target = space_ledger.reserve(candidates, size, keep_free)
+        if target is None:
+            logging.error('Недостаточно места для %s (%d МБ)', url, size // (1024 * 1024))
+            print(f"Недостаточно места на диске для: {url}")
+            return False
+        tried.append(target)
+        target_opts = {**ydl_opts, 'outtmpl': os.path.join(target, '%(title)s.%(ext)s')}
+        try:
+            with yt_dlp.YoutubeDL(target_opts) as ydl:
+                ydl.process_ie_result(info, download=True)
+            return True
+        except Exception as e:
+            if not _is_disk_full(e):
+                raise
+            logging.error('Закончилось место в %s: %s', target, e)
+            _remove_partial(target_opts, info)
+        finally:
+            space_ledger.release(target, size)
 
 
 def download_video(url, folder):
@@ -426,13 +1139,15 @@ def download_video(url, folder):
         'merge_output_format': 'mp4',
         'quiet': False,
         'no_warnings': True,
+        'progress_hooks': [_ydl_progress_hook],
+        'postprocessor_hooks': [_ydl_postprocessor_hook],
     }
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
+        return download_with_space_check(url, folder, ydl_opts)
     except Exception as e:
         logging.error('Ошибка при скачивании YouTube-содержимого: %s', e)
         print(f"Ошибка при скачивании YouTube-содержимого: {e}")
+        return False
 
 
 def download_playlist(url, folder):
@@ -443,179 +1158,978 @@ def download_playlist(url, folder):
         'quiet': False,
         'no_warnings': True,
         'yes_playlist': True,
+        'extract_flat': 'in_playlist',
+        'progress_hooks': [_ydl_progress_hook],
+        'postprocessor_hooks': [_ydl_postprocessor_hook],
     }
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
+        # Сначала только список роликов: каждый ролик проверяется на место
+        # и извлекается непосредственно перед скачиванием
+        with current_perf().span('resolve', url), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            playlist = ydl.extract_info(url, download=False)
+        entries = [entry for entry in playlist.get('entries') or [] if entry]
+        entry_opts = {**ydl_opts, 'noplaylist': True}
+        del entry_opts['yes_playlist'], entry_opts['extract_flat']
+        ok = bool(entries)
+        for entry in entries:
+            entry_url = entry.get('url') or entry.get('webpage_url')
+            try:
+                ok = download_with_space_check(entry_url, folder, entry_opts) and ok
+            except JobCancelled:
+                raise
+            except Exception as e:
+                logging.error('Ошибка при скачивании ролика %s: %s', entry_url, e)
+                ok = False
+        return ok
     except Exception as e:
         logging.error('Ошибка при скачивании плейлиста: %s', e)
         print(f"Ошибка при скачивании плейлиста: {e}")
+        return False
+
+
+# === Pinterest ===
+PINTEREST_HEADERS = {"User-Agent": "Mozilla/5.0"}
+PINTEREST_RESOURCE_URL = 'https://www.pinterest.com/resource/{name}/get/'
+PINTEREST_PAGE_SIZE = 25
+PINTEREST_MAX_PAGES = 200
+PINTEREST_WORKERS = 8
+PINTEREST_RESERVED_PATHS = {
+    'pin', 'search', 'ideas', 'today', 'explore', 'resource', 'settings',
+    'business', 'categories', 'topics', 'videos', '_',
+}
+# Profile tabs share the ``/<user>/<name>/`` shape with boards
+PINTEREST_PROFILE_TABS = {
+    'pins', 'boards', 'followers', 'following', 'likes', 'tried', 'collages',
+}
+PINIMG_SIZE_RE = re.compile(r'(//i\.pinimg\.com/)(?:\d+x\d*|\d+x)/')
+PWS_DATA_RE = re.compile(
+    r'<script[^>]+id="(?:__PWS_DATA__|__PWS_INITIAL_PROPS__)"[^>]*>(.*?)</script>',
+    re.DOTALL,
+)
+OG_IMAGE_RE = re.compile(
+    r'<meta[^>]+(?:property|name)="og:image"[^>]+content="([^"]+)"', re.IGNORECASE
+)
+
+
+def pinterest_original_url(img_url: str) -> str:
+    """Turn a sized ``i.pinimg.com`` thumbnail link into its ``originals`` link."""
+    return PINIMG_SIZE_RE.sub(r'\1originals/', img_url, count=1)
+
+
+def _pin_orig_url(pin: dict) -> Optional[str]:
+    images = pin.get('images')
+    if not isinstance(images, dict):
+        return None
+    orig = images.get('orig') or {}
+    if orig.get('url'):
+        return orig['url']
+    sized = [img for img in images.values() if isinstance(img, dict) and img.get('url')]
+    if not sized:
+        return None
+    best = max(sized, key=lambda img: img.get('width') or 0)
+    return pinterest_original_url(best['url'])
+
+
+def _find_pins(data, pin_id: Optional[str] = None) -> list[dict]:
+    """Return pin objects found anywhere inside embedded page JSON."""
+    pins: list[dict] = []
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if isinstance(node.get('images'), dict) and node.get('id'):
+                if pin_id is None or str(node['id']) == pin_id:
+                    pins.append(node)
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return pins
+
+
+def pinterest_image_urls(html: str, pin_id: Optional[str] = None) -> list[str]:
+    """Return candidate image links of a pin page, best first.
+
+    The embedded page JSON and ``og:image`` are read with regular expressions,
+    so the whole page is not parsed. Only when both are missing the page is
+    parsed, restricted to ``<img>`` tags.
+    """
+    candidates: list[str] = []
+    for raw in PWS_DATA_RE.findall(html):
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        for pin in _find_pins(data, pin_id):
+            img_url = _pin_orig_url(pin)
+            if img_url:
+                candidates.append(img_url)
+                break
+        if candidates:
+            break
+
+    m = OG_IMAGE_RE.search(html)
+    if m:
+        og_url = unescape(m.group(1))
+        candidates.extend((pinterest_original_url(og_url), og_url))
+
+    if not candidates:
+        soup = BeautifulSoup(html, HTML_PARSER, parse_only=SoupStrainer('img'))
+        sources = [img.get('src') for img in soup.find_all('img') if img.get('src')]
+        pinned = [src for src in sources if 'i.pinimg.com' in src]
+        for src in pinned or sources[:1]:
+            candidates.extend((pinterest_original_url(src), src))
+            break
+    return list(dict.fromkeys(candidates))
+
+
+def _save_pin_image(session, candidates: list[str], folder: str) -> Optional[str]:
+    """Download the first available link of ``candidates`` into ``folder``."""
+    for img_url in candidates:
+        try:
+            resp = timed_get(session, img_url, headers=PINTEREST_HEADERS, timeout=15)
+            if resp.status_code != 200:
+                continue
+            filename = os.path.join(folder, os.path.basename(img_url.split("?")[0]))
+            with current_perf().span('write', img_url), open(filename, 'wb') as f:
+                f.write(resp.content)
+            return filename
+        except Exception as e:
+            logging.error('Не удалось скачать %s: %s', img_url, e)
+    return None
+
+
+def pinterest_board_path(url: str) -> Optional[tuple[str, str, Optional[str]]]:
+    """Return ``(username, board, section)`` for a board or section link."""
+    parts = [p for p in urlparse(url).path.split('/') if p]
+    if len(parts) not in (2, 3) or parts[0].lower() in PINTEREST_RESERVED_PATHS:
+        return None
+    if parts[1].lower() in PINTEREST_PROFILE_TABS or any(p.startswith('_') for p in parts[1:]):
+        return None
+    section = parts[2] if len(parts) == 3 else None
+    return parts[0], parts[1], section
+
+
+def _pinterest_resource(session, name: str, source_url: str, options: dict) -> dict:
+    params = {
+        'source_url': source_url,
+        'data': json.dumps({'options': options, 'context': {}}),
+    }
+    resp = session.get(
+        PINTEREST_RESOURCE_URL.format(name=name), params=params,
+        headers={**PINTEREST_HEADERS, 'Accept': 'application/json'}, timeout=15,
+    )
+    resp.raise_for_status()
+    return resp.json().get('resource_response', {})
+
+
+def _pinterest_board_pins(session, username: str, slug: str, section: Optional[str]):
+    """Yield pins of a board or board section page by page."""
+    source_url = f'/{username}/{slug}/' + (f'{section}/' if section else '')
+    board = _pinterest_resource(
+        session, 'BoardResource', source_url, {'username': username, 'slug': slug}
+    ).get('data') or {}
+    board_id = board.get('id')
+    if not board_id:
+        raise ValueError('доска не найдена')
+
+    if section:
+        sections = _pinterest_resource(
+            session, 'BoardSectionsResource', source_url, {'board_id': board_id}
+        ).get('data') or []
+        match = [s for s in sections if section in (s.get('slug'), s.get('id'))]
+        if not match:
+            raise ValueError('раздел доски не найден')
+        name = 'BoardSectionPinsResource'
+        options = {'section_id': match[0]['id'], 'page_size': PINTEREST_PAGE_SIZE}
+    else:
+        name = 'BoardFeedResource'
+        options = {'board_id': board_id, 'page_size': PINTEREST_PAGE_SIZE}
+
+    bookmark = None
+    for _ in range(PINTEREST_MAX_PAGES):
+        page_options = {**options, 'bookmarks': [bookmark] if bookmark else []}
+        response = _pinterest_resource(session, name, source_url, page_options)
+        for pin in response.get('data') or []:
+            if isinstance(pin, dict):
+                yield pin
+        bookmark = response.get('bookmark')
+        if not bookmark or bookmark == '-end-':
+            break
+
+
+def download_pinterest_board(url: str, folder: str) -> bool:
+    """Скачивает все пины доски или раздела Pinterest."""
+    board_path = pinterest_board_path(url)
+    if not board_path:
+        print("Не удалось распознать ссылку на доску Pinterest.")
+        return False
+    username, slug, section = board_path
+    name = '-'.join(p for p in (username, slug, section) if p)
+    safe_name = "".join(c for c in name if c not in "\\/:*?\"<>|")
+    board_folder = os.path.join(folder, safe_name)
+    os.makedirs(board_folder, exist_ok=True)
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=PINTEREST_WORKERS)
+    session.mount('https://', adapter)
+    saved = 0
+    futures = []
+    ok = True
+    try:
+        with ThreadPoolExecutor(max_workers=PINTEREST_WORKERS) as pool:
+            for pin in _pinterest_board_pins(session, username, slug, section):
+                img_url = _pin_orig_url(pin)
+                if img_url:
+                    candidates = list(dict.fromkeys(
+                        (img_url, pin['images'].get('736x', {}).get('url') or img_url)
+                    ))
+                    futures.append(pool.submit(
+                        with_current_perf(_save_pin_image), session, candidates, board_folder))
+            for future in futures:
+                if future.result():
+                    saved += 1
+                report_progress(saved, len(futures))
+    except Exception as e:
+        response = getattr(e, 'response', None)
+        if response is not None and response.status_code in PERMANENT_HTTP_STATUSES:
+            report_permanent_failure(f'HTTP {response.status_code}: {url}')
+        logging.error('Ошибка при скачивании доски Pinterest: %s', e)
+        print(f"Ошибка при скачивании доски Pinterest: {e}")
+        ok = False
+    print(f"Сохранено изображений с доски: {saved}. Папка: {board_folder}")
+    return ok and saved == len(futures)
 
 
 def download_pinterest_image(url, folder):
     try:
-        response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
-        soup = BeautifulSoup(response.text, 'html.parser')
-        img_tag = soup.find('img')
-        if img_tag and img_tag.get('src'):
-            img_url = img_tag['src']
-            print(f"Скачиваем изображение: {img_url}")
-            img_data = requests.get(img_url).content
-            filename = os.path.join(folder, os.path.basename(img_url.split("?")[0]))
-            with open(filename, 'wb') as f:
-                f.write(img_data)
-            print(f"Изображение сохранено как: {filename}")
+        with current_perf().span('resolve', url):
+            response = http_cache.get(url, headers=PINTEREST_HEADERS)
+            if response.status_code != 200:
+                # Страницу ошибки не разбираем: её og:image — не картинка пина
+                if response.status_code in PERMANENT_HTTP_STATUSES:
+                    report_permanent_failure(f'HTTP {response.status_code}: {url}')
+                print(f"Страница Pinterest недоступна: HTTP {response.status_code}")
+                return False
+            m = re.search(r"/pin/(\d+)", response.url or url)
+            candidates = pinterest_image_urls(response.text, m.group(1) if m else None)
+        if candidates:
+            print(f"Скачиваем изображение: {candidates[0]}")
+            filename = _save_pin_image(requests, candidates, folder)
+            if filename:
+                print(f"Изображение сохранено как: {filename}")
+                return True
+            print("Не удалось скачать изображение Pinterest.")
         else:
             print("Не удалось найти изображение на странице Pinterest.")
     except Exception as e:
         logging.error('Ошибка при скачивании изображения с Pinterest: %s', e)
         print(f"Ошибка при скачивании изображения с Pinterest: {e}")
+    return False
 
 
 def download_direct_image(url, folder):
     try:
-        response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
+        response = timed_get(requests, url, headers={"User-Agent": "Mozilla/5.0"})
+        if response.status_code in PERMANENT_HTTP_STATUSES:
+            report_permanent_failure(f'HTTP {response.status_code}: {url}')
         response.raise_for_status()
         filename = os.path.join(folder, os.path.basename(url.split("?")[0]))
-        with open(filename, "wb") as f:
+        with current_perf().span('write', url), open(filename, "wb") as f:
             f.write(response.content)
         print(f"Изображение сохранено как: {filename}")
+        return True
     except Exception as e:
         logging.error('Ошибка при скачивании изображения: %s', e)
         print(f"Ошибка при скачивании изображения: {e}")
+        return False
 
 
-def download_wb_images(url: str, folder: str) -> None:
-    """Скачивает все изображения товара Wildberries."""
+# === Wildberries ===
+WB_BASKET_URL = 'https://basket-{host:02d}.wbbasket.ru'
+WB_BASKET_HOSTS = 100
+WB_SELLER_CATALOG_URL = (
+    'https://catalog.wb.ru/sellers/v2/catalog'
+    '?appType=1&curr=rub&dest=-1257786&sort=popular&spp=30'
+)
+WB_BRAND_CATALOG_URL = (
+    'https://catalog.wb.ru/brands/v2/catalog'
+    '?appType=1&curr=rub&dest=-1257786&sort=popular&spp=30'
+)
+WB_BRAND_INFO_URL = 'https://static-basket-01.wbbasket.ru/vol0/data/brands/{slug}.json'
+WB_CATALOG_MAX_PAGES = 50
+WB_HEADERS = {"User-Agent": "Mozilla/5.0"}
+WB_WORKERS = 8
+WB_EXPORT_FILE = 'wb-products.csv'
+# Сколько секунд помнить товары, которых нет ни на одном сервере
+WB_MISSING_TTL = 3600
+WB_EXPORT_FIELDS = ['id', 'name', 'brand', 'photo_count', 'folder', 'options', 'description']
+
+
+# Товары, которых нет ни на одном сервере: ID -> время проверки
+_wb_missing: dict[str, float] = {}
+
+
+def wb_product_id(url: str) -> Optional[str]:
+    """Return the product ID from a Wildberries ``/catalog/<id>/`` link."""
+    hostname = (urlparse(url).hostname or '').lower()
+    if 'wildberries.ru' not in hostname:
+        return None
+    m = re.search(r"/catalog/(\d+)/", url)
+    return m.group(1) if m else None
+
+
+def wb_line_ids(line: str) -> list[str]:
+    """Return product IDs of a bare ``<id>`` or ``wb:<id>,<id>`` line."""
+    line = line.strip()
+    if not WB_IDS_RE.fullmatch(line):
+        return []
+    return list(dict.fromkeys(re.findall(r'\d+', line)))
+
+
+def _wb_vol_part(product_id: str) -> tuple[int, int]:
+    return int(product_id) // 100000, int(product_id) // 1000
+
+
+def _wb_session() -> requests.Session:
+    """Return a session with a connection pool sized for parallel fetches."""
+    session = requests.Session()
+    session.headers.update(WB_HEADERS)
+    adapter = HTTPAdapter(pool_connections=WB_WORKERS, pool_maxsize=WB_WORKERS * 2)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def fetch_wb_card(
+    session: requests.Session, product_id: str, hosts: dict[int, int]
+) -> Optional[tuple[dict, int]]:
+    """Find the basket host of a product and return its ``card.json``.
+
+    ``hosts`` maps ``vol`` to an already resolved basket number. It is
+    checked first and updated on success, so products from the same ``vol``
+    do not probe all basket hosts again. A product that every host answered
+    404 for is remembered for ``WB_MISSING_TTL`` seconds and reported as a
+    permanent failure without probing again.
+    """
+    checked = _wb_missing.get(product_id)
+    if checked is not None and time.time() - checked < WB_MISSING_TTL:
+        report_permanent_failure(f'товар WB {product_id} не найден')
+        return None
+    with current_perf().span('resolve', product_id):
+        found = _probe_wb_card(session, product_id, hosts)
+    if found is None and product_id in _wb_missing:
+        report_permanent_failure(f'товар WB {product_id} не найден')
+    return found
+
+
+def _probe_wb_card(
+    session: requests.Session, product_id: str, hosts: dict[int, int]
+) -> Optional[tuple[dict, int]]:
+    vol, part = _wb_vol_part(product_id)
+    known = hosts.get(vol)
+    candidates = list(range(WB_BASKET_HOSTS))
+    if known is not None:
+        candidates.remove(known)
+        candidates.insert(0, known)
+    not_found = True
+    for host in candidates:
+        card_url = (
+            f"{WB_BASKET_URL.format(host=host)}/vol{vol}/part{part}/"
+            f"{product_id}/info/ru/card.json"
+        )
+        try:
+            resp = http_cache.get(card_url, session, timeout=5)
+            if resp.status_code == 200:
+                hosts[vol] = host
+                _wb_missing.pop(product_id, None)
+                return resp.json(), host
+            if resp.status_code not in PERMANENT_HTTP_STATUSES:
+                not_found = False
+        except Exception:
+            not_found = False
+            continue
+    if not_found:
+        _wb_missing[product_id] = time.time()
+    return None
+
+
+def _wb_product_folder(card_data: dict, product_id: str, folder: str) -> str:
+    name = card_data.get("imt_name")
+    # Цвета и размеры одного товара делят imt_name, поэтому добавляем артикул
+    name = f"{name} ({product_id})" if name else f"wb_{product_id}"
+    safe_name = "".join(c for c in name if c not in "\\/:*?\"<>|")
+    product_folder = os.path.join(folder, safe_name)
+    os.makedirs(product_folder, exist_ok=True)
+    return product_folder
+
+
+def _wb_photo_urls(card_data: dict, product_id: str, host: int) -> list[str]:
+    count = card_data.get("media", {}).get("photo_count") or 0
+    vol, part = _wb_vol_part(product_id)
+    host_part = WB_BASKET_URL.format(host=host)
+    return [
+        f"{host_part}/vol{vol}/part{part}/{product_id}/images/big/{i}.webp"
+        for i in range(1, count + 1)
+    ]
+
+
+def _wb_download_photo(session: requests.Session, img_url: str, out_path: str) -> bool:
     try:
-        m = re.search(r"/catalog/(\d+)/", url)
-        if not m:
-            print("Не удалось извлечь ID товара из ссылки WB.")
-            return
-        product_id = m.group(1)
+        img_data = timed_get(session, img_url, timeout=10).content
+        with current_perf().span('write', img_url), open(out_path, "wb") as f:
+            f.write(img_data)
+        print(f"Скачано: {out_path}")
+        return True
+    except Exception as e:
+        logging.error("Не удалось скачать %s: %s", img_url, e)
+        return False
+
+
+def _wb_options(card_data: dict) -> list[tuple[str, list[tuple[str, str]]]]:
+    groups = []
+    for group in card_data.get("grouped_options", []):
+        options = []
+        for opt in group.get("options", []):
+            name = opt.get("name", "").strip()
+            value = opt.get("value", "").strip()
+            if name or value:
+                options.append((name, value))
+        groups.append((group.get("group_name") or '', options))
+    return groups
+
+
+def _wb_export_row(card_data: dict, product_id: str, product_folder: str) -> dict:
+    options = [
+        f"{name} - {value}"
+        for _, group in _wb_options(card_data)
+        for name, value in group
+    ]
+    return {
+        'id': product_id,
+        'name': card_data.get("imt_name", ''),
+        'brand': card_data.get("selling", {}).get("brand_name", ''),
+        'photo_count': card_data.get("media", {}).get("photo_count") or 0,
+        'folder': product_folder,
+        'options': '; '.join(options),
+        'description': (card_data.get("description") or '').strip(),
+    }
 
-        vol = int(product_id) // 100000
-        part = int(product_id) // 1000
 
-        headers = {"User-Agent": "Mozilla/5.0"}
+def write_wb_export(rows: list[dict], folder: str) -> None:
+    """Store product metadata rows in the shared CSV export in ``folder``.
 
-        card_data = None
-        host_used = None
-        for host in range(100):
-            card_url = (
-                f"https://basket-{host:02d}.wbbasket.ru/vol{vol}/part{part}/"
-                f"{product_id}/info/ru/card.json"
-            )
-            try:
-                resp = requests.get(card_url, headers=headers, timeout=5)
-                if resp.status_code == 200:
-                    card_data = resp.json()
-                    host_used = host
-                    break
-            except Exception:
-                continue
+    Rows are keyed by product ``id``: a product downloaded again replaces its
+    previous row, so repeated runs of the same list do not add duplicates.
+    """
+    if not rows:
+        return
+    path = os.path.join(folder, WB_EXPORT_FILE)
+    try:
+        with wb_export_lock:
+            merged: dict[str, dict] = {}
+            if os.path.exists(path):
+                with open(path, encoding='utf-8-sig', newline='') as f:
+                    for row in csv.DictReader(f):
+                        if row.get('id'):
+                            merged[row['id']] = row
+            for row in rows:
+                merged[str(row['id'])] = row
+            tmp_path = path + '.tmp'
+            # utf-8-sig keeps Cyrillic readable when the file is opened in Excel
+            with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=WB_EXPORT_FIELDS, extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(merged.values())
+            os.replace(tmp_path, path)
+        print(f"Описание товаров сохранено в: {path}")
+    except Exception as e:
+        logging.error("Не удалось сохранить таблицу WB: %s", e)
+
+
+def download_wb_images(url: str, folder: str) -> bool:
+    """Скачивает все изображения товара Wildberries."""
+    try:
+        product_id = wb_product_id(url)
+        if not product_id:
+            print("Не удалось извлечь ID товара из ссылки WB.")
+            return False
 
-        if not card_data:
+        session = _wb_session()
+        hosts = load_wb_hosts()
+        found = fetch_wb_card(session, product_id, hosts)
+        if not found:
             print("Не удалось получить данные о товаре WB.")
-            return
+            return False
+        card_data, host_used = found
+        save_wb_hosts(hosts)
 
-        name = card_data.get("imt_name", f"wb_{product_id}")
-        safe_name = "".join(c for c in name if c not in "\\/:*?\"<>|")
-        product_folder = os.path.join(folder, safe_name)
-        os.makedirs(product_folder, exist_ok=True)
+        product_folder = _wb_product_folder(card_data, product_id, folder)
 
-        count = card_data.get("media", {}).get("photo_count") or 0
-        if not count:
+        photo_urls = _wb_photo_urls(card_data, product_id, host_used)
+        if not photo_urls:
             print("Не удалось определить количество изображений WB.")
-            return
+            return False
 
-        host_part = f"https://basket-{host_used:02d}.wbbasket.ru"
+        saved = 0
+        for i, img_url in enumerate(photo_urls, 1):
+            if _wb_download_photo(session, img_url, os.path.join(product_folder, f"{i}.webp")):
+                saved += 1
+            report_progress(i, len(photo_urls))
 
-        for i in range(1, count + 1):
-            img_url = (
-                f"{host_part}/vol{vol}/part{part}/{product_id}/images/big/{i}.webp"
-            )
-            try:
-                img_data = requests.get(img_url, headers=headers, timeout=10).content
-                out_path = os.path.join(product_folder, f"{i}.webp")
-                with open(out_path, "wb") as f:
-                    f.write(img_data)
-                print(f"Скачано: {out_path}")
-            except Exception as e:
-                logging.error("Не удалось скачать %s: %s", img_url, e)
-
-        # Save textual information about the product
-        lines: list[str] = []
-        for group in card_data.get("grouped_options", []):
-            group_name = group.get("group_name")
-            if group_name:
-                lines.append(group_name)
-            for opt in group.get("options", []):
-                name = opt.get("name", "").strip()
-                value = opt.get("value", "").strip()
-                if name or value:
-                    lines.append(f"{name} - {value}")
-            lines.append("")
-
-        desc = card_data.get("description")
-        if desc:
-            lines.append("Описание")
-            lines.append(desc.strip())
-
-        if lines:
-            info_path = os.path.join(product_folder, "info.txt")
-            try:
-                with open(info_path, "w", encoding="utf-8") as f:
-                    f.write("\n".join(lines))
-            except Exception as e:
-                logging.error("Не удалось сохранить описание WB: %s", e)
+        write_wb_export([_wb_export_row(card_data, product_id, product_folder)], folder)
+        return saved == len(photo_urls)
     except Exception as e:
         logging.error("Ошибка при скачивании изображений WB: %s", e)
         print(f"Ошибка при скачивании изображений WB: {e}")
+        return False
+
+
+def download_wb_batch(product_ids: list[str], folder: str) -> list[str]:
+    """Скачивает изображения многих товаров WB за один проход.
+
+    Products are grouped by ``vol``: the first card of each group resolves the
+    basket host and the rest of the group reuses it. Card and photo requests
+    share one thread pool and one pooled session, so photos of finished cards
+    download while other cards are still being fetched. Product metadata goes
+    into a single CSV export instead of one ``info.txt`` per folder.
+
+    Returns IDs of products whose card or photos could not be downloaded.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    if not product_ids:
+        print("Список товаров WB пуст.")
+        return []
+
+    groups: dict[int, list[str]] = {}
+    for product_id in product_ids:
+        groups.setdefault(_wb_vol_part(product_id)[0], []).append(product_id)
+
+    session = _wb_session()
+    hosts = load_wb_hosts()
+    rows: list[dict] = []
+    failed: list[str] = []
+    print(f"Пакетная загрузка WB: {len(product_ids)} товаров.")
+
+    with ThreadPoolExecutor(max_workers=WB_WORKERS) as pool:
+        cards: dict = {}
+        photos = []
+
+        def submit_card(product_id: str, rest: list[str]) -> None:
+            future = pool.submit(with_current_perf(fetch_wb_card), session, product_id, hosts)
+            cards[future] = (product_id, rest)
+
+        for group in groups.values():
+            submit_card(group[0], group[1:])
+
+        while cards:
+            done, _ = wait(list(cards), return_when=FIRST_COMPLETED)
+            for future in done:
+                product_id, rest = cards.pop(future)
+                # The host of this vol is known now (or probing failed);
+                # either way the remaining products can go in parallel.
+                for other in rest:
+                    submit_card(other, [])
+                try:
+                    found = future.result()
+                except Exception as e:
+                    logging.error("Ошибка получения карточки WB %s: %s", product_id, e)
+                    found = None
+                report_progress(len(rows) + len(failed) + 1, len(product_ids))
+                if not found:
+                    failed.append(product_id)
+                    continue
+                card_data, host = found
+                product_folder = _wb_product_folder(card_data, product_id, folder)
+                for i, img_url in enumerate(_wb_photo_urls(card_data, product_id, host), 1):
+                    out_path = os.path.join(product_folder, f"{i}.webp")
+                    photos.append((product_id, pool.submit(
+                        with_current_perf(_wb_download_photo), session, img_url, out_path)))
+                rows.append(_wb_export_row(card_data, product_id, product_folder))
+
+        wait([future for _, future in photos])
+        for product_id, future in photos:
+            if not future.result() and product_id not in failed:
+                failed.append(product_id)
+
+    save_wb_hosts(hosts)
+    write_wb_export(rows, folder)
+    if failed:
+        logging.error("Не удалось получить товары WB: %s", ', '.join(failed))
+        print(f"Не удалось скачать {len(failed)} товаров WB.")
+    print(f"Пакетная загрузка WB завершена: {len(rows)} из {len(product_ids)}.")
+    return failed
+
+
+def _wb_catalog_ids(session: requests.Session, base_url: str) -> list[str]:
+    """Collect product IDs from a paginated WB catalog endpoint."""
+    ids: list[str] = []
+    for page in range(1, WB_CATALOG_MAX_PAGES + 1):
+        try:
+            resp = session.get(f"{base_url}&page={page}", timeout=10)
+            if resp.status_code != 200:
+                break
+            products = resp.json().get("data", {}).get("products", [])
+        except Exception as e:
+            logging.error("Ошибка чтения каталога WB: %s", e)
+            break
+        if not products:
+            break
+        ids.extend(str(p["id"]) for p in products if p.get("id"))
+    return ids
+
+
+def wb_listing_ids(url: str) -> list[str]:
+    """Return product IDs of a WB seller (``/seller/<id>``) or brand page."""
+    with current_perf().span('resolve', url):
+        return _wb_listing_ids(url)
+
+
+def _wb_listing_ids(url: str) -> list[str]:
+    path = urlparse(url).path
+    session = _wb_session()
+    m = re.search(r"/seller/(\d+)", path)
+    if m:
+        return _wb_catalog_ids(session, f"{WB_SELLER_CATALOG_URL}&supplier={m.group(1)}")
+    m = re.search(r"/brands/([^/?#]+)", path)
+    if m:
+        slug = m.group(1)
+        brand_id = slug if slug.isdigit() else None
+        if brand_id is None:
+            try:
+                resp = session.get(WB_BRAND_INFO_URL.format(slug=slug), timeout=10)
+                brand_id = str(resp.json().get("id") or '') or None
+            except Exception as e:
+                logging.error("Не удалось определить бренд WB %s: %s", slug, e)
+        if brand_id:
+            return _wb_catalog_ids(session, f"{WB_BRAND_CATALOG_URL}&brand={brand_id}")
+    return []
+
+
+def wb_product_url(product_id: str) -> str:
+    return f'https://www.wildberries.ru/catalog/{product_id}/detail.aspx'
+
+
+def requeue_wb_products(product_ids: list[str]) -> None:
+    """Put products that failed in a batch back into download-list.txt.
+
+    Each product becomes its own link, so only the failed products are
+    retried and, if they keep failing, written to ``dead-letter.txt``.
+    """
+    added = append_to_download_list([wb_product_url(pid) for pid in product_ids])
+    if added:
+        logging.info('Товары WB возвращены в список для повтора: %d', len(added))
+        print(f"Возвращено в список для повтора: {len(added)} товаров WB")
+
+
+def download_wb_ids(line: str, folder: str) -> bool:
+    """Скачивает товары WB по артикулам из строки списка одним пакетом."""
+    product_ids = wb_line_ids(line)
+    if not product_ids:
+        print("В строке нет артикулов WB.")
+        return False
+    requeue_wb_products(download_wb_batch(product_ids, folder))
+    return True
+
+
+def download_wb_listing(url: str, folder: str) -> bool:
+    """Скачивает все товары продавца или бренда Wildberries.
+
+    The listing counts as finished once its products were fetched; failed
+    products are retried one by one through ``requeue_wb_products``.
+    """
+    product_ids = wb_listing_ids(url)
+    if not product_ids:
+        print("Не удалось получить список товаров WB.")
+        return False
+    requeue_wb_products(download_wb_batch(product_ids, folder))
+    return True
 
 
-def handle_url(url: str) -> None:
-    """Определяет тип ссылки и запускает скачивание."""
+def url_kind(url: str) -> str:
+    """Return the kind of link used to choose its handler."""
+    if WB_IDS_RE.fullmatch(url.strip()):
+        return 'wb_ids'
     parsed = urlparse(url)
     hostname = parsed.hostname or ""
     hostname = hostname.lower()
     path = parsed.path.lower()
 
     if path.endswith((".jpg", ".jpeg", ".png", ".webp", ".gif")):
+        return 'image'
+    if "youtube.com/playlist" in url:
+        return 'playlist'
+    if "youtube.com" in hostname or "youtu.be" in hostname:
+        return 'video'
+    if "pinterest." in hostname and pinterest_board_path(url):
+        return 'pinterest_board'
+    if "pinterest." in hostname or hostname == "pin.it":
+        return 'pinterest'
+    if "wildberries.ru" in hostname and re.search(r"/(seller|brands)/", path):
+        return 'wb_listing'
+    if "wildberries.ru" in hostname:
+        return 'wb'
+    return 'unknown'
+
+
+def handle_url(url: str) -> bool:
+    """Определяет тип ссылки и запускает скачивание.
+
+    Returns ``True`` when the download finished without errors.
+    """
+    with current_perf().span('total', url):
+        return _route_url(url)
+
+
+def _route_url(url: str) -> bool:
+    kind = url_kind(url)
+
+    if kind == 'image':
         logging.info('Скачиваем изображение по прямой ссылке: %s', url)
         print(f"Это прямая ссылка на изображение. Скачиваем в: {PICTURES_FOLDER}")
-        download_direct_image(url, PICTURES_FOLDER)
+        return download_direct_image(url, PICTURES_FOLDER)
 
-    elif "youtube.com/playlist" in url:
+    elif kind == 'playlist':
         logging.info('Скачиваем плейлист: %s', url)
         print(f"Это плейлист YouTube. Скачиваем всё в: {PLAYLIST_FOLDER}")
-        download_playlist(url, PLAYLIST_FOLDER)
+        return download_playlist(url, PLAYLIST_FOLDER)
 
-    elif "youtube.com" in hostname or "youtu.be" in hostname:
+    elif kind == 'video':
         logging.info('Скачиваем видео: %s', url)
         print(f"Это видео YouTube. Скачиваем в: {VIDEOS_FOLDER}")
-        download_video(url, VIDEOS_FOLDER)
+        return download_video(url, VIDEOS_FOLDER)
 
-    elif "pinterest.com" in hostname:
+    elif kind == 'pinterest_board':
+        logging.info('Скачиваем доску Pinterest: %s', url)
+        print("Это доска Pinterest. Скачиваем все пины...")
+        return download_pinterest_board(url, PICTURES_FOLDER)
+
+    elif kind == 'pinterest':
         logging.info('Скачиваем изображение Pinterest: %s', url)
         print("Это Pinterest ссылка. Пытаемся скачать...")
-        download_pinterest_image(url, PICTURES_FOLDER)
+        return download_pinterest_image(url, PICTURES_FOLDER)
+
+    elif kind == 'wb_ids':
+        logging.info('Скачиваем товары Wildberries по артикулам: %s', url)
+        print("Это артикулы Wildberries. Скачиваем все товары...")
+        return download_wb_ids(url, WB_FOLDER)
 
-    elif "wildberries.ru" in hostname:
+    elif kind == 'wb_listing':
+        logging.info('Скачиваем товары продавца/бренда Wildberries: %s', url)
+        print("Это страница продавца или бренда Wildberries. Скачиваем все товары...")
+        return download_wb_listing(url, WB_FOLDER)
+
+    elif kind == 'wb':
         logging.info('Скачиваем товар Wildberries: %s', url)
         print("Это ссылка Wildberries. Пытаемся скачать изображения...")
-        download_wb_images(url, WB_FOLDER)
+        return download_wb_images(url, WB_FOLDER)
 
     else:
         logging.warning('Неизвестная ссылка: %s', url)
         print("Сайт не поддерживается этим скриптом.")
+        report_permanent_failure(f'сайт не поддерживается: {url}')
+        return False
+
+
+# === Очередь скачивания с повторами ===
+# Меньшее значение скачивается раньше: картинки до больших видео
+URL_PRIORITIES = {
+    'image': 0,
+    'pinterest': 1,
+    'wb': 1,
+    'pinterest_board': 2,
+    'wb_listing': 2,
+    'wb_ids': 2,
+    'video': 3,
+    'playlist': 4,
+    'unknown': 5,
+}
 
 
-def download_all(icon: Optional[pystray.Icon] = None) -> None:
-    """Скачивает все ссылки из файла download-list.txt в отдельном потоке."""
-    if downloading.is_set():
-        print("Скачивание уже выполняется.")
-        return
+class CircuitBreaker:
+    """Stops requests to a host after several consecutive failures.
+
+    After ``failures`` errors in a row the host is skipped for ``cooldown``
+    seconds. The next attempt after the pause is a trial: success closes the
+    breaker, another failure opens it again.
+    """
+
+    def __init__(self, failures: int, cooldown: float) -> None:
+        self.failures = failures
+        self.cooldown = cooldown
+        self._errors: dict[str, int] = {}
+        self._open_until: dict[str, float] = {}
+
+    def blocked_until(self, host: str) -> float:
+        return self._open_until.get(host, 0.0)
+
+    def record(self, host: str, ok: bool) -> None:
+        if ok:
+            self._errors.pop(host, None)
+            self._open_until.pop(host, None)
+            return
+        errors = self._errors.get(host, 0) + 1
+        self._errors[host] = errors
+        if errors >= self.failures:
+            self._open_until[host] = time.time() + self.cooldown
+            logging.warning('Сайт %s временно пропускается после %d ошибок', host, errors)
+
+
+class QueueItem:
+    def __init__(self, url: str, seq: int, max_wait: float) -> None:
+        self.url = url
+        self.seq = seq
+        self.priority = URL_PRIORITIES[url_kind(url)]
+        self.host = (urlparse(url).hostname or '').lower()
+        # Срок считается от попадания ссылки в очередь и не сдвигается повторами
+        self.deadline = time.time() + max_wait if max_wait > 0 else float('inf')
+        self.attempts = 0
+        self.ready_at = 0.0
+
+    def sort_key(self, now: float) -> tuple:
+        # Просроченные ссылки идут первыми и по очереди ожидания,
+        # чтобы большие видео не ждали вечно
+        if self.deadline <= now:
+            return (0, self.deadline, self.priority, self.seq)
+        return (1, self.priority, self.ready_at, self.seq)
+
+
+class DownloadQueue:
+    """Очередь ссылок с приоритетами, повторами и списком неудач.
+
+    Links are taken by priority (see ``URL_PRIORITIES``); a link waiting
+    longer than ``max_wait`` seconds since it was queued goes first regardless
+    of priority, oldest first. ``refill`` returns the current list of links
+    and is polled for links added while the queue runs. A failed link is
+    retried after an exponential backoff with jitter, up to ``max_attempts``
+    times, and then written to ``system/dead-letter.txt``; a permanent failure
+    (unsupported site, HTTP 404) goes there at once. Hosts that keep failing
+    are paused by a ``CircuitBreaker``.
+    """
+
+    def __init__(self, urls: list[str], settings: dict,
+                 refill: Optional[Callable[[], list[str]]] = None) -> None:
+        self.max_attempts = max(1, int(settings['max_attempts']))
+        self.base_delay = float(settings['base_delay'])
+        self.max_delay = float(settings['max_delay'])
+        self.breaker = CircuitBreaker(
+            max(1, int(settings['breaker_failures'])), float(settings['breaker_cooldown'])
+        )
+        self.max_wait = float(settings['max_wait'])
+        self.refill = refill
+        self._seq = itertools.count()
+        self._seen: set[str] = set()
+        self._items: list[QueueItem] = []
+        self.add(urls)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, urls: list[str]) -> int:
+        """Queue links that were not queued before and return how many."""
+        added = 0
+        for url in urls:
+            if url not in self._seen:
+                self._seen.add(url)
+                self._items.append(QueueItem(url, next(self._seq), self.max_wait))
+                added += 1
+        return added
+
+    def pop(self) -> Optional[QueueItem]:
+        """Wait for the next link that may be tried and return it."""
+        while True:
+            if self.refill is not None:
+                added = self.add(self.refill())
+                if added:
+                    logging.info('В очередь добавлено новых ссылок: %d', added)
+            if not self._items:
+                return None
+            now = time.time()
+            for item in self._items:
+                blocked = self.breaker.blocked_until(item.host)
+                if blocked > item.ready_at:
+                    item.ready_at = blocked
+            ready = [item for item in self._items if item.ready_at <= now]
+            if ready:
+                item = min(ready, key=lambda i: i.sort_key(now))
+                self._items.remove(item)
+                return item
+            time.sleep(min(1.0, min(i.ready_at for i in self._items) - now))
+
+    def done(self, item: QueueItem, ok: bool, permanent: bool = False) -> bool:
+        """Record the result; return ``True`` when the link is finished."""
+        # Ответ 404 означает, что сайт работает
+        if ok or not permanent:
+            self.breaker.record(item.host, ok)
+        if ok:
+            return True
+        item.attempts += 1
+        if permanent or item.attempts >= self.max_attempts:
+            write_dead_letter(item.url, item.attempts)
+            return True
+        delay = min(self.max_delay, self.base_delay * 2 ** (item.attempts - 1))
+        item.ready_at = time.time() + delay * random.uniform(0.5, 1.5)
+        self._items.append(item)
+        logging.info('Повтор %d для %s через %.0f с', item.attempts, item.url, delay)
+        return False
+
+
+def write_dead_letter(url: str, attempts: int) -> None:
+    """Append a link that kept failing to ``dead-letter.txt``."""
+    logging.error('Ссылка не скачана после %d попыток: %s', attempts, url)
+    print(f"Не удалось скачать после {attempts} попыток: {url}")
+    try:
+        with open(DEAD_LETTER_FILE, 'a', encoding='utf-8') as f:
+            f.write(url + '\n')
+    except Exception as e:
+        logging.error('Не удалось записать dead-letter.txt: %s', e)
+
+
+def read_download_list() -> list[str]:
+    """Return links from download-list.txt."""
+    with download_list_lock:
+        if not os.path.exists(DOWNLOAD_LIST):
+            return []
+        with open(DOWNLOAD_LIST, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+
+
+def append_to_download_list(urls: list[str]) -> list[str]:
+    """Append links missing from download-list.txt and return them."""
+    with download_list_lock:
+        existing: set[str] = set()
+        if os.path.exists(DOWNLOAD_LIST):
+            with open(DOWNLOAD_LIST, 'r', encoding='utf-8') as f:
+                existing = {line.strip() for line in f if line.strip()}
+        added = [url for url in dict.fromkeys(urls) if url not in existing]
+        if added:
+            with open(DOWNLOAD_LIST, 'a', encoding='utf-8') as f:
+                f.writelines(url + '\n' for url in added)
+    return added
+
+
+def remove_from_download_list(urls: list[str]) -> None:
+    """Remove processed links, keeping lines added in the meantime."""
+    done = set(urls)
+    with download_list_lock:
+        if not os.path.exists(DOWNLOAD_LIST):
+            return
+        with open(DOWNLOAD_LIST, 'r', encoding='utf-8') as f:
+            lines = [line.strip() for line in f if line.strip()]
+        with open(DOWNLOAD_LIST, 'w', encoding='utf-8') as f:
+            f.writelines(line + '\n' for line in lines if line not in done)
+
+
+def download_all(icon: Optional[pystray.Icon] = None) -> bool:
+    """Скачивает все ссылки из файла download-list.txt в отдельном потоке.
+
+    Returns ``False`` when a download is already running.
+    """
+    # Запуск могут одновременно вызвать горячая клавиша, трей, API и наблюдение
+    with download_start_lock:
+        if downloading.is_set():
+            print("Скачивание уже выполняется.")
+            return False
+        downloading.set()
 
     # —————— Смена иконки на dw.ico ——————
     if icon is not None and ICON_DOWNLOADING:
@@ -625,22 +2139,55 @@ def download_all(icon: Optional[pystray.Icon] = None) -> None:
             pass
 
     def worker() -> None:
+        settings = load_settings('profiling', PROFILING_DEFAULTS)
+        profiler = cProfile.Profile() if profiling_enabled(settings) else None
+        # Поток живёт один прогон, замеры API и обработчиков сюда не попадают
+        recorder = perf.detach()
+        _perf_local.recorder = recorder
+        if profiler:
+            profiler.enable()
+        processed = False
         try:
             if not os.path.exists(DOWNLOAD_LIST):
                 print("Файл download-list.txt не найден.")
                 return
 
-            with open(DOWNLOAD_LIST, 'r', encoding='utf-8') as f:
-                urls = [line.strip() for line in f if line.strip()]
+            urls = list(dict.fromkeys(read_download_list()))
 
             if not urls:
                 print("Список ссылок пуст.")
                 return
 
-            for url in urls:
-                handle_url(url)
-
-            open(DOWNLOAD_LIST, 'w', encoding='utf-8').close()
+            # Несколько товаров WB скачиваем одним пакетом,
+            # неудачные товары повторяются через общую очередь
+            wb_urls = {wb_product_id(url): url for url in urls if wb_product_id(url)}
+            if len(wb_urls) > 1:
+                processed = True
+                logging.info('Пакетная загрузка WB: %d товаров', len(wb_urls))
+                with current_perf().span('total', f'WB: {len(wb_urls)} товаров'):
+                    failed = set(download_wb_batch(list(wb_urls), WB_FOLDER))
+                finished = [url for pid, url in wb_urls.items() if pid not in failed]
+                remove_from_download_list(finished)
+                urls = [url for url in urls if url not in finished]
+
+            # Ссылки, добавленные во время скачивания, тоже попадают в очередь
+            try:
+                jobs = DownloadQueue(urls, load_settings('retry', RETRY_DEFAULTS),
+                                     refill=read_download_list)
+            except ValueError as e:
+                logging.error('Неверные настройки повторов: %s', e)
+                jobs = DownloadQueue(urls, RETRY_DEFAULTS, refill=read_download_list)
+            while (item := jobs.pop()) is not None:
+                processed = True
+                take_permanent_failure()
+                try:
+                    ok = handle_url(item.url)
+                except Exception as e:
+                    logging.error('Ошибка обработки %s: %s', item.url, e)
+                    ok = False
+                permanent = take_permanent_failure() is not None
+                if jobs.done(item, ok, permanent):
+                    remove_from_download_list([item.url])
             print("Скачивание завершено!")
             if icon is not None:
                 try:
@@ -649,7 +2196,18 @@ def download_all(icon: Optional[pystray.Icon] = None) -> None:
                     pass
 
         finally:
-            downloading.clear()
+            try:
+                http_cache.save()
+                if profiler:
+                    profiler.disable()
+                # Пустой прогон не затирает отчёт предыдущего
+                if processed:
+                    profile_text = _profile_summary(profiler) if profiler else ''
+                    write_perf_report(recorder, PERF_REPORT_FILE, profile_text, settings)
+            except Exception as e:
+                logging.error('Не удалось сохранить результаты замеров: %s', e)
+            finally:
+                downloading.clear()
             # —————— Возврат иконки ico.ico ——————
             if icon is not None and ICON_DEFAULT:
                 try:
@@ -657,8 +2215,8 @@ def download_all(icon: Optional[pystray.Icon] = None) -> None:
                 except Exception:
                     pass
 
-    downloading.set()
     threading.Thread(target=worker, daemon=True).start()
+    return True
 
 
 
@@ -668,10 +2226,11 @@ def add_link_from_clipboard() -> None:
     logging.info('Hotkey triggered: copying selection')
 
     captured = ''
-    if clipboard_helper:
-        captured = clipboard_helper.copy_selection()
-    if not captured:
-        captured = attempt_copy_selected_text()
+    with current_perf().span('clipboard'):
+        if clipboard_helper:
+            captured = clipboard_helper.copy_selection()
+        if not captured:
+            captured = attempt_copy_selected_text()
     url = ""
     if captured:
         m = re.search(r"https?://\S+", captured)
@@ -687,22 +2246,14 @@ def add_link_from_clipboard() -> None:
         print("Скопированный текст не похож на ссылку.")
         return
 
-    existing = []
-    if os.path.exists(DOWNLOAD_LIST):
-        with open(DOWNLOAD_LIST, 'r', encoding='utf-8') as f:
-            existing = [line.strip() for line in f if line.strip()]
-
-    if url in existing:
+    if not append_to_download_list([url]):
         logging.info('Дубликат ссылки: %s', url)
         print('Ссылка уже присутствует в списке.')
         return
 
-    with open(DOWNLOAD_LIST, 'a', encoding='utf-8') as f:
-        f.write(url + '\n')
     confirm = False
     try:
-        with open(DOWNLOAD_LIST, 'r', encoding='utf-8') as f:
-            confirm = url in [line.strip() for line in f if line.strip()]
+        confirm = url in read_download_list()
     except Exception:
         pass
     if confirm:
@@ -713,8 +2264,813 @@ def add_link_from_clipboard() -> None:
         print("Не удалось добавить ссылку в список.")
 
 
+# === Наблюдение за папками и списком ссылок ===
+INGEST_EXTENSIONS = ('.txt', '.url', '.lst')
+# Последняя строка без перевода строки считается готовой, если файл
+# не менялся это время
+INGEST_SETTLE_SECONDS = 2.0
+# Сколько последних перенесённых ссылок помнить, чтобы не брать их повторно
+INGEST_SEEN_LIMIT = 100000
+
+
+class FileTail:
+    """Reads only the bytes appended to a file since the previous call.
+
+    Like ``tail -f`` the offset is reset when the file is replaced or becomes
+    shorter than the consumed part.
+    """
+
+    def __init__(self, path: str, offset: int = 0, inode: int = 0) -> None:
+        self.path = path
+        self.offset = offset
+        self.inode = inode
+
+    def read_lines(self) -> list[str]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return []
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            self.inode = st.st_ino
+            self.offset = 0
+        if st.st_size == self.offset:
+            return []
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(st.st_size - self.offset)
+        except OSError as e:
+            logging.error('Не удалось прочитать %s: %s', self.path, e)
+            return []
+        end = data.rfind(b'\n') + 1
+        if time.time() - st.st_mtime >= INGEST_SETTLE_SECONDS:
+            end = len(data)
+        self.offset += end
+        text = data[:end].decode('utf-8', errors='replace').lstrip('\ufeff')
+        return text.splitlines()
+
+
+def _urls_from_lines(lines: list[str]) -> list[str]:
+    urls = []
+    for line in lines:
+        line = line.strip()
+        # Ярлыки Windows (.url) хранят ссылку в строке URL=...
+        if line.upper().startswith('URL='):
+            line = line[4:]
+        if WB_IDS_RE.fullmatch(line):
+            urls.append(line)
+            continue
+        urls.extend(URL_RE.findall(line))
+    return urls
+
+
+class Ingestor:
+    """Переносит ссылки из папок-приёмников в download-list.txt.
+
+    Text files and ``.url`` shortcuts in the watched folders are read
+    incrementally: only bytes appended since the last poll are parsed, and
+    offsets survive restarts in ``system/ingest-state.json``. The state also
+    keeps the links already taken from the folders, so a file that is read
+    again from the start (replaced by an editor, truncated) does not bring
+    back links that were downloaded since. New links are appended to
+    ``download-list.txt`` without duplicates. The list file itself
+    is watched as well: downloads rewrite it in place, so instead of tailing it
+    the set of links is compared with the previous one whenever the file
+    changes. Links added by hand or through the hotkey count towards the batch
+    that starts ``download_all`` automatically once ``batch_size`` links are
+    waiting or nothing arrived for ``idle_seconds``.
+    """
+
+    def __init__(self, folders: list[str], batch_size: int, idle_seconds: float,
+                 auto_download: bool, poll_seconds: float,
+                 icon: Optional[pystray.Icon] = None) -> None:
+        self.folders = folders
+        self.batch_size = batch_size
+        self.idle_seconds = idle_seconds
+        self.auto_download = auto_download
+        self.poll_seconds = poll_seconds
+        self.icon = icon
+        self._tails: dict[str, FileTail] = {}
+        # Упорядоченный словарь как множество: старые ссылки вытесняются первыми
+        self._seen: dict[str, None] = {}
+        self._pending: set[str] = set()
+        self._last_activity = time.time()
+        self._stop = threading.Event()
+        self._load_state()
+        # Ссылки, уже лежащие в списке, не считаются новыми
+        self._list_signature: Optional[tuple[int, int]] = None
+        self._list_links: set[str] = set()
+        self._new_list_links()
+
+    def _load_state(self) -> None:
+        try:
+            with open(INGEST_STATE_FILE, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.error('Не удалось прочитать состояние наблюдения: %s', e)
+            return
+        files = state['files'] if 'files' in state else state
+        for path, (offset, inode) in files.items():
+            self._tails[path] = FileTail(path, offset, inode)
+        self._seen = dict.fromkeys(state.get('seen', []))
+
+    def _save_state(self) -> None:
+        state = {
+            'files': {path: [t.offset, t.inode] for path, t in self._tails.items()},
+            'seen': list(self._seen),
+        }
+        try:
+            with open(INGEST_STATE_FILE, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+        except Exception as e:
+            logging.error('Не удалось сохранить состояние наблюдения: %s', e)
+
+    def _scan_folders(self) -> tuple[list[str], bool]:
+        urls: list[str] = []
+        seen: set[str] = set()
+        for folder in self.folders:
+            try:
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith(INGEST_EXTENSIONS):
+                    continue
+                seen.add(entry.path)
+                tail = self._tails.setdefault(entry.path, FileTail(entry.path))
+                urls.extend(_urls_from_lines(tail.read_lines()))
+        removed = [path for path in self._tails if path not in seen]
+        for path in removed:
+            del self._tails[path]
+        return urls, bool(removed)
+
+    def _new_list_links(self) -> set[str]:
+        """Return links that appeared in download-list.txt since the last call."""
+        try:
+            st = os.stat(DOWNLOAD_LIST)
+            signature = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            signature = None
+        if signature == self._list_signature:
+            return set()
+        self._list_signature = signature
+        current = set(read_download_list())
+        added = current - self._list_links
+        self._list_links = current
+        # Ссылки, уже скачанные и удалённые из списка, больше не ждут
+        self._pending &= current
+        return added
+
+    def poll_once(self) -> None:
+        before = {path: (t.offset, t.inode) for path, t in self._tails.items()}
+        urls, removed = self._scan_folders()
+        urls = [url for url in dict.fromkeys(urls) if url not in self._seen]
+        if urls:
+            added = append_to_download_list(urls)
+            self._seen.update(dict.fromkeys(urls))
+            for old in list(itertools.islice(self._seen, max(0, len(self._seen) - INGEST_SEEN_LIMIT))):
+                del self._seen[old]
+            if added:
+                logging.info('Из папок добавлено ссылок: %d', len(added))
+                print(f"Из папок добавлено ссылок: {len(added)}")
+        if urls or removed or before != {path: (t.offset, t.inode) for path, t in self._tails.items()}:
+            self._save_state()
+
+        new_links = self._new_list_links()
+        now = time.time()
+        if new_links:
+            self._pending |= new_links
+            self._last_activity = now
+        if not self.auto_download or not self._pending or downloading.is_set():
+            return
+        if len(self._pending) >= self.batch_size or now - self._last_activity >= self.idle_seconds:
+            logging.info('Автоматический запуск скачивания: %d ссылок', len(self._pending))
+            self._pending.clear()
+            download_all(self.icon)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll_once()
+            except Exception as e:
+                logging.error('Ошибка наблюдения за папками: %s', e)
+
+    def start(self) -> None:
+        for folder in self.folders:
+            os.makedirs(folder, exist_ok=True)
+        threading.Thread(target=self._run, daemon=True).start()
+        logging.info('Наблюдение за папками: %s', ', '.join(self.folders) or '-')
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def start_ingestor(icon: Optional[pystray.Icon] = None) -> Optional[Ingestor]:
+    """Start watching folders configured in the ``[ingest]`` section."""
+    settings = load_settings('ingest', INGEST_DEFAULTS)
+    if settings['enabled'].lower() not in ('1', 'yes', 'true', 'on'):
+        return None
+    folders = [
+        os.path.join(ROOT_DIR, folder.strip())
+        for folder in settings['folders'].split(';') if folder.strip()
+    ]
+    try:
+        ingestor = Ingestor(
+            folders,
+            batch_size=max(1, int(settings['batch_size'])),
+            idle_seconds=float(settings['idle_seconds']),
+            auto_download=settings['auto_download'].lower() in ('1', 'yes', 'true', 'on'),
+            poll_seconds=float(settings['poll_seconds']),
+            icon=icon,
+        )
+    except ValueError as e:
+        logging.error('Неверные настройки наблюдения: %s', e)
+        return None
+    ingestor.start()
+    return ingestor
+
+
+# === Headless режим и API управления ===
+JOB_HISTORY = 1000
+
+
+class Job:
+    """Ссылка, поставленная в очередь через API управления."""
+
+    def __init__(self, job_id: int, url: str) -> None:
+        self.id = job_id
+        self.url = url
+        self.status = 'queued'
+        self.progress = 0.0
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cancel_requested = threading.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'url': self.url,
+            'status': self.status,
+            'progress': round(self.progress, 3),
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class JobQueue:
+    """Очередь ссылок, которые обрабатываются ``handle_url`` в фоне.
+
+    Links of unfinished jobs are kept in ``journal_path`` and queued again
+    when the queue is created, so a restart does not lose submitted links.
+    """
+
+    def __init__(self, workers: int = 2, journal_path: Optional[str] = None) -> None:
+        self._jobs: OrderedDict[int, Job] = OrderedDict()
+        self._pending: queue.Queue[Job] = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.journal_path = journal_path or API_QUEUE_FILE
+        # Замеры от первого задания до опустошения очереди
+        self._recorder: Optional[PerfRecorder] = None
+        restored = self._load_journal()
+        if restored:
+            logging.info('Восстановлено заданий API: %d', len(self.submit(restored)))
+        for _ in range(max(1, workers)):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def _load_journal(self) -> list[str]:
+        try:
+            with open(self.journal_path, encoding='utf-8') as f:
+                return [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logging.error('Не удалось прочитать очередь API: %s', e)
+            return []
+
+    def _save_journal(self) -> None:
+        """Rewrite the journal with links of queued and running jobs."""
+        urls = [job.url for job in self._jobs.values() if job.status in ('queued', 'running')]
+        tmp_path = self.journal_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.writelines(url + '\n' for url in urls)
+            os.replace(tmp_path, self.journal_path)
+        except Exception as e:
+            logging.error('Не удалось сохранить очередь API: %s', e)
+
+    def submit(self, urls: list[str]) -> list[Job]:
+        """Queue every link in ``urls`` and return the created jobs."""
+        jobs = []
+        with self._lock:
+            for url in urls:
+                url = url.strip()
+                if not (URL_RE.fullmatch(url) or WB_IDS_RE.fullmatch(url)):
+                    continue
+                job = Job(next(self._ids), url)
+                self._jobs[job.id] = job
+                jobs.append(job)
+            self._prune()
+            self._save_journal()
+        for job in jobs:
+            self._pending.put(job)
+            logging.info('Задание %d добавлено: %s', job.id, job.url)
+        return jobs
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - JOB_HISTORY)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: int) -> Optional[Job]:
+        """Cancel a queued job or ask a running one to stop."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == 'queued':
+                job.status = 'cancelled'
+                job.finished = time.time()
+                self._save_journal()
+            elif job.status == 'running':
+                job.cancel_requested.set()
+            recorder = self._end_run_if_idle()
+        if recorder:
+            write_perf_report(recorder, API_PERF_REPORT_FILE)
+        return job
+
+    def _end_run_if_idle(self) -> Optional[PerfRecorder]:
+        """Return the run recorder once no job is queued or running."""
+        if self._recorder is None:
+            return None
+        if any(job.status in ('queued', 'running') for job in self._jobs.values()):
+            return None
+        recorder, self._recorder = self._recorder, None
+        return recorder
+
+    def counts(self) -> dict:
+        counts: dict[str, int] = {}
+        for job in self.list():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def _worker(self) -> None:
+        while True:
+            job = self._pending.get()
+            with self._lock:
+                if job.status != 'queued':
+                    continue
+                job.status = 'running'
+                job.started = time.time()
+                if self._recorder is None:
+                    self._recorder = PerfRecorder()
+                recorder = self._recorder
+            _current_job.job = job
+            try:
+                with perf_run(recorder):
+                    ok = handle_url(job.url)
+            except JobCancelled:
+                ok = False
+            except Exception as e:
+                logging.error('Ошибка задания %d: %s', job.id, e)
+                ok = False
+            finally:
+                _current_job.job = None
+            with self._lock:
+                if job.cancel_requested.is_set() and not ok:
+                    job.status = 'cancelled'
+                else:
+                    job.status = 'done' if ok else 'failed'
+                    if ok:
+                        job.progress = 1.0
+                job.finished = time.time()
+                self._save_journal()
+                finished_run = self._end_run_if_idle()
+            http_cache.save()
+            logging.info('Задание %d завершено: %s', job.id, job.status)
+            if finished_run:
+                write_perf_report(finished_run, API_PERF_REPORT_FILE)
+
+
+class ControlHandler(BaseHTTPRequestHandler):
+    """HTTP API управления.
+
+    ``GET /status`` and ``GET /jobs[/<id>]`` report state, ``POST /jobs``
+    queues links (JSON ``{"urls": [...]}`` or plain text, one per line),
+    ``DELETE /jobs/<id>`` cancels a job and ``POST /download`` runs
+    ``download_all`` for ``download-list.txt``.
+
+    Every request must carry the ``X-Auth-Token`` header. Requests with an
+    ``Origin`` header come from web pages and are refused.
+    """
+
+    server: 'ControlServer'
+
+    def log_message(self, format, *args) -> None:
+        logging.info('API %s - %s', self.address_string(), format % args)
+
+    def _reply(self, status: int, data) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        if self.headers.get('Origin'):
+            self._reply(403, {'error': 'cross-origin requests are not allowed'})
+            return False
+        token = self.headers.get('X-Auth-Token') or ''
+        if not self.server.token or not secrets.compare_digest(token.encode('utf-8'), self.server.token.encode('utf-8')):
+            self._reply(401, {'error': 'unauthorized'})
+            return False
+        return True
+
+    def _job_id(self) -> Optional[int]:
+        m = re.fullmatch(r'/jobs/(\d+)(?:/cancel)?/?', urlparse(self.path).path)
+        return int(m.group(1)) if m else None
+
+    def do_GET(self) -> None:
+        if not self._authorized():
+            return
+        path = urlparse(self.path).path.rstrip('/')
+        jobs = self.server.jobs
+        if path == '/status':
+            self._reply(200, {'downloading': downloading.is_set(), 'jobs': jobs.counts()})
+        elif path == '/jobs':
+            self._reply(200, [job.to_dict() for job in jobs.list()])
+        elif self._job_id() is not None:
+            job = jobs.get(self._job_id())
+            if job:
+                self._reply(200, job.to_dict())
+            else:
+                self._reply(404, {'error': 'not found'})
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_POST(self) -> None:
+        if not self._authorized():
+            return
+        path = urlparse(self.path).path.rstrip('/')
+        if path == '/jobs':
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                if length < 0:
+                    raise ValueError('invalid Content-Length')
+                raw = self.rfile.read(length).decode('utf-8', errors='replace')
+                urls = _parse_submitted_urls(raw, self.headers.get('Content-Type', ''))
+            except ValueError as e:
+                self._reply(400, {'error': str(e)})
+                return
+            created = self.server.jobs.submit(urls)
+            self._reply(201, [job.to_dict() for job in created])
+        elif path == '/download':
+            if not download_all(self.server.icon):
+                self._reply(409, {'error': 'download already running'})
+                return
+            self._reply(202, {'started': True})
+        elif path.endswith('/cancel'):
+            self.do_DELETE()
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_DELETE(self) -> None:
+        if not self._authorized():
+            return
+        job_id = self._job_id()
+        job = self.server.jobs.cancel(job_id) if job_id is not None else None
+        if job:
+            self._reply(200, job.to_dict())
+        else:
+            self._reply(404, {'error': 'not found'})
+
+
+def _parse_submitted_urls(raw: str, content_type: str) -> list[str]:
+    if 'json' not in content_type:
+        return [line.strip() for line in raw.splitlines() if line.strip()]
+    data = json.loads(raw or '{}')
+    if isinstance(data, list):
+        return [str(url) for url in data]
+    if isinstance(data, dict):
+        urls = data.get('urls') or ([data['url']] if data.get('url') else [])
+        if isinstance(urls, list):
+            return [str(url) for url in urls]
+    raise ValueError('expected a list of links')
+
+
+class ControlServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], jobs: JobQueue, token: str = '',
+                 icon: Optional[pystray.Icon] = None) -> None:
+        super().__init__(address, ControlHandler)
+        self.jobs = jobs
+        self.token = token
+        self.icon = icon
+
+
+def api_token(settings: dict) -> str:
+    """Return the API token, creating and saving one on first start."""
+    token = settings['token'].strip()
+    if not token:
+        token = secrets.token_urlsafe(24)
+        save_setting('daemon', 'token', token, DAEMON_DEFAULTS)
+        logging.info('Создан токен API управления, он сохранён в config.ini')
+    return token
+
+
+def start_control_server(icon: Optional[pystray.Icon] = None) -> Optional[ControlServer]:
+    """Start the control API configured in the ``[daemon]`` section."""
+    settings = load_settings('daemon', DAEMON_DEFAULTS)
+    settings['token'] = api_token(settings)
+    try:
+        host = settings['host']
+        port = int(settings['port'])
+        workers = int(settings['workers'])
+        server = ControlServer((host, port), JobQueue(workers), settings['token'], icon)
+    except Exception as e:
+        logging.error('Не удалось запустить API управления: %s', e)
+        print(f"Не удалось запустить API управления: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info('API управления запущено на %s:%d', host, port)
+    print(f"API управления: http://{host}:{port}/")
+    return server
+
+
+def run_headless() -> None:
+    """Работает без трея и горячих клавиш, управление только через API."""
+    ensure_single_instance()
+    ensure_directories()
+    server = start_control_server()
+    if server is None:
+        return
+    start_ingestor()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    try:
+        while not stop.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        http_cache.save()
+    print('Скрипт завершён.')
+
+
+# === Распределённая обработка списка ===
+class LeaseStore:
+    """Общая очередь ссылок в базе SQLite для нескольких экземпляров.
+
+    The database may live on a shared volume. Workers lease one link at a
+    time; a lease expires after ``lease_seconds`` unless it is renewed, so
+    links held by a worker that died return to the queue. A link whose lease
+    expired ``max_attempts`` times is marked failed instead of being leased
+    again. Every link is stored once, so it is not downloaded twice even when
+    added again; only failed links return to the queue when added again.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 300, max_attempts: int = 3) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' url TEXT PRIMARY KEY,'
+                " status TEXT NOT NULL DEFAULT 'pending',"
+                ' worker TEXT,'
+                ' lease_until REAL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' added REAL NOT NULL,'
+                ' finished REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_until)')
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: транзакции открываются явно через BEGIN IMMEDIATE
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def add(self, urls: list[str]) -> int:
+        """Add new or failed links and return how many were queued."""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            before = conn.total_changes
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'INSERT INTO jobs (url, added) VALUES (?, ?)'
+                " ON CONFLICT (url) DO UPDATE SET status = 'pending', worker = NULL,"
+                ' lease_until = NULL, attempts = 0, added = excluded.added, finished = NULL'
+                " WHERE status = 'failed'",
+                [(url, now) for url in urls],
+            )
+            conn.execute('COMMIT')
+            return conn.total_changes - before
+
+    def lease(self, worker: str) -> Optional[str]:
+        """Lease the oldest pending or expired link for ``worker``."""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._fail_exhausted(conn, now)
+            row = conn.execute(
+                "SELECT url FROM jobs WHERE status = 'pending'"
+                " OR (status = 'leased' AND lease_until < ?)"
+                ' ORDER BY added LIMIT 1',
+                (now,),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?,"
+                    ' attempts = attempts + 1 WHERE url = ?',
+                    (worker, now + self.lease_seconds, row[0]),
+                )
+            conn.execute('COMMIT')
+        return row[0] if row else None
+
+    def renew(self, url: str, worker: str) -> bool:
+        """Extend the lease; ``False`` means the link was taken over."""
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE url = ? AND worker = ?"
+                " AND status = 'leased'",
+                (time.time() + self.lease_seconds, url, worker),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, url: str, worker: str, ok: bool) -> bool:
+        """Store the result of a leased link."""
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, lease_until = NULL, finished = ?"
+                " WHERE url = ? AND worker = ? AND status = 'leased'",
+                ('done' if ok else 'failed', time.time(), url, worker),
+            )
+            return cur.rowcount == 1
+
+    def _fail_exhausted(self, conn: sqlite3.Connection, now: float) -> list[str]:
+        """Mark expired leases that used up their attempts as failed."""
+        urls = [row[0] for row in conn.execute(
+            "SELECT url FROM jobs WHERE status = 'leased' AND lease_until < ?"
+            ' AND attempts >= ?',
+            (now, self.max_attempts),
+        )]
+        if urls:
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed', lease_until = NULL, finished = ?"
+                ' WHERE url = ?',
+                [(now, url) for url in urls],
+            )
+            for url in urls:
+                logging.error('Ссылка не обработана за %d попыток: %s', self.max_attempts, url)
+        return urls
+
+    def reclaim(self) -> int:
+        """Return expired leases to the queue and report how many."""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._fail_exhausted(conn, now)
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'pending', worker = NULL, lease_until = NULL"
+                " WHERE status = 'leased' AND lease_until < ?",
+                (now,),
+            )
+            conn.execute('COMMIT')
+            return cur.rowcount
+
+    def counts(self) -> dict:
+        with closing(self._connect()) as conn:
+            return dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+
+
+def _cluster_settings() -> dict:
+    settings = {k: v.strip() for k, v in load_settings('cluster', CLUSTER_DEFAULTS).items()}
+    try:
+        settings['lease_seconds'] = float(settings['lease_seconds'])
+        settings['poll_seconds'] = float(settings['poll_seconds'])
+        settings['max_attempts'] = int(settings['max_attempts'])
+    except ValueError:
+        logging.error('Неверные настройки [cluster], используются значения по умолчанию')
+        settings['lease_seconds'] = float(CLUSTER_DEFAULTS['lease_seconds'])
+        settings['poll_seconds'] = float(CLUSTER_DEFAULTS['poll_seconds'])
+        settings['max_attempts'] = int(CLUSTER_DEFAULTS['max_attempts'])
+    return settings
+
+
+def open_lease_store(path: str = '') -> tuple[LeaseStore, dict]:
+    settings = _cluster_settings()
+    store = LeaseStore(
+        path or settings['database'] or QUEUE_DB,
+        settings['lease_seconds'],
+        settings['max_attempts'],
+    )
+    return store, settings
+
+
+def run_coordinator(database: str = '') -> None:
+    """Переносит ссылки из download-list.txt в общую очередь.
+
+    Runs until interrupted: new links are imported every ``poll_seconds`` and
+    leases of dead workers are reclaimed.
+    """
+    ensure_single_instance()
+    store, settings = open_lease_store(database)
+    poll = settings['poll_seconds']
+    print(f"Координатор запущен. Очередь: {store.path}")
+    try:
+        while True:
+            try:
+                # Ссылки удаляются из списка только после записи в очередь
+                urls = read_download_list()
+                if urls:
+                    added = store.add(urls)
+                    remove_from_download_list(urls)
+                    logging.info('В общую очередь добавлено %d ссылок', added)
+                    print(f"Добавлено в общую очередь: {added}")
+                reclaimed = store.reclaim()
+                if reclaimed:
+                    logging.warning('Возвращено в очередь просроченных заданий: %d', reclaimed)
+            except sqlite3.Error as e:
+                logging.error('Ошибка общей очереди, повтор через %.0f с: %s', poll, e)
+            time.sleep(poll)
+    except KeyboardInterrupt:
+        pass
+    print(f"Состояние очереди: {store.counts()}")
+
+
+def run_worker(database: str = '') -> None:
+    """Берёт ссылки из общей очереди и скачивает их."""
+    ensure_directories()
+    store, settings = open_lease_store(database)
+    worker = settings['worker_id'] or f'{socket.gethostname()}-{os.getpid()}'
+    poll = settings['poll_seconds']
+    print(f"Обработчик {worker} подключён к очереди: {store.path}")
+    # Замеры от первой ссылки до опустошения очереди
+    recorder: Optional[PerfRecorder] = None
+    try:
+        while True:
+            url = store.lease(worker)
+            if url is None:
+                if recorder:
+                    write_perf_report(recorder, WORKER_PERF_REPORT_FILE)
+                    recorder = None
+                time.sleep(poll)
+                continue
+            if recorder is None:
+                recorder = PerfRecorder()
+            logging.info('Обработчик %s взял ссылку: %s', worker, url)
+            stop = threading.Event()
+
+            def heartbeat(url: str = url) -> None:
+                while not stop.wait(store.lease_seconds / 3):
+                    if not store.renew(url, worker):
+                        logging.warning('Аренда ссылки потеряна: %s', url)
+                        return
+
+            beat = threading.Thread(target=heartbeat, daemon=True)
+            beat.start()
+            try:
+                with perf_run(recorder):
+                    ok = handle_url(url)
+            except Exception as e:
+                logging.error('Ошибка обработки %s: %s', url, e)
+                ok = False
+            finally:
+                stop.set()
+                beat.join()
+            if not store.complete(url, worker, ok):
+                logging.warning('Результат не сохранён, аренда истекла: %s', url)
+            http_cache.save()
+    except KeyboardInterrupt:
+        pass
+    if recorder:
+        write_perf_report(recorder, WORKER_PERF_REPORT_FILE)
+    print('Обработчик остановлен.')
+
+
 def main() -> None:
     """Запускает горячие клавиши и значок в трее."""
+    if pystray is None:
+        logging.error('Tray is unavailable, use --headless')
+        print('Значок в трее недоступен. Запустите скрипт с параметром --headless.')
+        return
     ensure_single_instance()
     global clipboard_helper
     clipboard_helper = ClipboardHelper()
@@ -793,12 +3149,18 @@ def main() -> None:
         except Exception as e:
             logging.error('Не удалось открыть info.txt: %s', e)
 
+    # Включение и выключение cProfile
+    def toggle_profiling(icon, item):
+        set_profiling(not profiling_enabled())
+
     # Составляем меню
     menu = pystray.Menu(
         pystray.MenuItem('Скачать', on_download),
         pystray.MenuItem('Список загрузок', open_list),
         pystray.MenuItem('Открыть папку для загрузки', open_folder),
         pystray.MenuItem('Горячие клавиши', change_hotkey),
+        pystray.MenuItem('Профилирование', toggle_profiling,
+                         checked=lambda item: profiling_enabled()),
         pystray.MenuItem('Инфо', show_info),
         pystray.MenuItem('Выход', on_exit),
     )
@@ -806,6 +3168,10 @@ def main() -> None:
     # Иконка в трее
     tray_icon = pystray.Icon('YTDownloader', ICON_DEFAULT, 'YT Downloader', menu)
 
+    if load_settings('daemon', DAEMON_DEFAULTS)['enabled'].lower() in ('1', 'yes', 'true', 'on'):
+        start_control_server(tray_icon)
+    start_ingestor(tray_icon)
+
     # Привязка горячих клавиш
     hotkey_manager.register(add_hotkey, lambda: on_add(tray_icon))
     hotkey_manager.register(download_hotkey, lambda: download_all(tray_icon))
@@ -817,6 +3183,28 @@ def main() -> None:
         clipboard_helper.stop()
     print('Скрипт завершён.')
 
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='YT Downloader')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--headless', action='store_true',
+                      help='run without tray icon, controlled through the HTTP API')
+    mode.add_argument('--coordinator', action='store_true',
+                      help='feed download-list.txt into the shared queue')
+    mode.add_argument('--worker', action='store_true',
+                      help='download links leased from the shared queue')
+    parser.add_argument('--database', default='',
+                        help='path of the shared queue database')
+    return parser.parse_args(argv)
+
+
 if __name__ == '__main__':
     multiprocessing.freeze_support()
-    main()
+    args = parse_args()
+    if args.headless:
+        run_headless()
+    elif args.coordinator:
+        run_coordinator(args.database)
+    elif args.worker:
+        run_worker(args.database)
+    else:
+        main()
@@ -1,16 +1,18 @@
 from pathlib import Path
 import shutil
 
-def copy_files(list_path: Path) -> None:
-    """Copy files listed in ``list_path`` to ``~/Downloads/Sorted``.
+def copy_files(list_path: Path, target_dir: Path | None = None) -> None:
+    """Copy files listed in ``list_path`` to ``target_dir``.
 
-    Each line in ``list_path`` should contain an absolute path to a file. The
-    file names are preserved when copying. Missing files are skipped.
+    ``target_dir`` defaults to ``~/Downloads/Sorted``. Each line in
+    ``list_path`` should contain an absolute path to a file. The file names
+    are preserved when copying. Missing files are skipped.
     """
     if not list_path.exists():
         raise FileNotFoundError(f"List file not found: {list_path}")
 
-    target_dir = Path.home() / "Downloads" / "Sorted"
+    if target_dir is None:
+        target_dir = Path.home() / "Downloads" / "Sorted"
     target_dir.mkdir(parents=True, exist_ok=True)
 
     with list_path.open(encoding="utf-8") as f: